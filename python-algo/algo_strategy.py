@@ -3,7 +3,6 @@ import random
 import math
 import warnings
 from sys import maxsize
-import json
 from utils.pathfinder import most_convenient_spawn_location
 
 
@@ -56,14 +55,18 @@ class AlgoStrategy(gamelib.AlgoCore):
         INTERCEPTOR = config["unitInformation"][5]["shorthand"]
         MP = 1
         SP = 0
+        self.rules = gamelib.ruleset(config)
         # This is a good place to do initial setup
         self.scored_on_locations = []
+        self.tracker = gamelib.TurnTracker(config, self.rules)
 
     def on_turn(self, turn_state):
         """
         Main place to control strategy
         """
-        game_state = gamelib.GameState(self.config, turn_state)
+        game_state, events = self.tracker.update(turn_state)
+        for description in gamelib.describe_events([event for event in events if event.player_index == 1]):
+            gamelib.debug_write(description)
 
         gamelib.debug_write(
             "Performing turn {} of your custom algo strategy".format(
@@ -552,14 +555,10 @@ class AlgoStrategy(gamelib.AlgoCore):
         counts dict for each enemy stationary unit found.
         """
 
-        for loc in locations:
-            t = tuple(loc)
-            # only if there’s any stationary unit there
-            if not game_state.contains_stationary_unit(loc):
-                continue
-            for u in game_state.game_map[t]:
-                if u.player_index == 1 and u.unit_type in counts:
-                    counts[u.unit_type] += 1
+        for unit_type in counts:
+            # only look at the locations where the enemy has this unit type
+            found = {tuple(loc) for loc in game_state.game_map.locations_of(1, unit_type)}
+            counts[unit_type] += sum(1 for loc in locations if tuple(loc) in found)
         return counts
 
     def sum_enemy_health_in_locations(self, game_state, locations):
@@ -567,21 +566,11 @@ class AlgoStrategy(gamelib.AlgoCore):
         Scans the given list of [x,y] coords and returns the total
         current health of all enemy stationary units found there.
         """
-        total_health = 0
-        for loc in locations:
-            # fast-path: no unit here? skip
-            if not game_state.contains_stationary_unit(loc):
-                continue
-            # otherwise grab every unit at that spot
-            for unit in game_state.game_map[tuple(loc)]:
-                # only enemy stationary units
-                if unit.player_index == 1:
-                    total_health += unit.health  # current HP
-        return total_health
+        return game_state.game_map.sum_structure_health(locations, 1)
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x=None, valid_y=None):
         total_units = 0
-        for location in game_state.game_map:
+        for location in game_state.game_map.iter_occupied():
             if game_state.contains_stationary_unit(location):
                 for unit in game_state.game_map[location]:
                     if (
@@ -600,7 +589,7 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
-    def on_action_frame(self, turn_string):
+    def on_action_frame(self, state):
         """
         This is the action frame of the game. This function could be called
         hundreds of times per turn and could slow the algo down so avoid putting slow code here.
@@ -608,7 +597,6 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
         events = state["events"]
         breaches = events["breach"]
 
@@ -8,7 +8,11 @@ The GameMap class in game_map.py represents the current game map. It can be used
 Investigating it is useful for any player that wants to access more information about the current state of the game. \n
 
 The GameUnit class in unit.py represents a single unit. 
-Investigating it is useful for any player that wants to access information about units. \n
+Investigating it is useful for any player that wants to access information about units. 
+The stats shared by every unit of a type live in UnitSpec objects, see unit_specs. \n
+
+The RuleSet class in rules.py is compiled once from the game config and holds the unit types, costs, ranges and resource schedule. 
+AlgoCore.on_game_start compiles it and GameState, GameMap and GameUnit take it as their rules argument. \n
 
 The AlgoCore class in algocore.py handles communication with the game engine, and forms the bones of an algo. AlgoStrategy inherits from it. 
 Investigating it is useful for advanced players interested in getting data from the action phase or communicating directly with the game engine. \n
@@ -16,14 +20,27 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to path-finding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+batch_navigation.py finds paths on a whole stack of hypothetical boards at once with NumPy. \n
+
+geometry.py holds static facts about the board shape, such as which locations are in bounds, their neighbours and the edges. 
+They are computed once and shared by the other modules. \n
+
+The TurnTracker class in tracker.py keeps the map from one turn to the next and rebuilds only the locations that changed. 
+It also reports the changes as StructureEvents, such as the structures your opponent added, upgraded or lost. \n
+
+The Plan class in planner.py works out a priority list of spawns, upgrades and removals in one pass, see GameState.plan. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
 from .algocore import AlgoCore
 from .util import debug_write
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, UnitSpec, unit_specs
+from .rules import RuleSet, ruleset
 from .game_map import GameMap
+from .tracker import TurnTracker, StructureEvent, describe_events
+from .planner import Plan
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "batch_navigation", "game_state", "game_map", "geometry", "navigation", "planner", "rules", "tracker", "unit", "util"]
  
\ No newline at end of file
@@ -1,8 +1,31 @@
-import json
+import re
+
+from . import codec
 
 from .game_state import GameState
+from .rules import ruleset
 from .util import get_command, debug_write, BANNER_TEXT, send_command
 
+_TURN_INFO = re.compile(r'"turnInfo"\s*:\s*\[\s*(-?\d+)')
+
+
+def message_type(message):
+    """Reads the state type of a game state message without decoding it
+
+    Args:
+        message: A game state message from the engine, as a json string
+
+    Returns:
+        The first entry of turnInfo, 0 for a turn, 1 for an action frame and 2 for the end of the game. 
+        None if the message has no turnInfo.
+
+    """
+    match = _TURN_INFO.search(message)
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
 class AlgoCore(object):
     """
     This class handles communication with the game engine. \n
@@ -10,23 +33,26 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * rules (RuleSet): The rules compiled from config, pass it to GameState
 
     """
     def __init__(self):
         self.config = None
+        self.rules = None
 
     def on_game_start(self, config):
         """
         This function is called once at the start of the game. 
-        By default, it just initializes the config. \n
+        By default, it just initializes the config and compiles its RuleSet. \n
         You can override it it in algo_strategy.py to perform start of game setup
         """
         self.config = config
+        self.rules = ruleset(config)
 
     def on_turn(self, game_state):
         """
         This step function is called at the start of each turn.
-        It is passed the current game state, which can be used to initiate a new GameState object. 
+        It is passed the current game state, already decoded from json, which can be used to initiate a new GameState object. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -38,7 +64,7 @@ class AlgoCore(object):
         """
         After each deploy phase, the game engine will run the action phase of the round.
         The action phase is made up of a sequence of distinct frames. 
-        Each of these frames is sent to the algo in order. 
+        Each of these frames is sent to the algo in order, already decoded from json. 
         They can be handled in this function. 
         """
         pass
@@ -61,22 +87,25 @@ class AlgoCore(object):
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
-                parsed_config = json.loads(game_state_string)
+                parsed_config = codec.loads(game_state_string)
                 self.on_game_start(parsed_config)
             elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+                """
+                The state type is read straight from the string, so each message is decoded at most once 
+                and the end game message is not decoded at all.
+                """
+                stateType = message_type(game_state_string)
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    self.on_turn(codec.loads(game_state_string))
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    self.on_action_frame(codec.loads(game_state_string))
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
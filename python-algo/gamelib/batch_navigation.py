@@ -0,0 +1,133 @@
+"""
+Path-finding on many boards at once with NumPy, for planners that score many candidate layouts.
+
+The boards are a stack of blocked masks, shaped (boards, ARENA_SIZE, ARENA_SIZE) and indexed [board, x, y] 
+like the GameMap planes. Every breadth first search step expands the frontier of all boards together, 
+and the paths are walked with the same choice between equally short moves as ShortestPathFinder, 
+so navigate_boards returns what ShortestPathFinder.navigate_multiple_endpoints would on each board.
+Locations are compared as [x, y] lists, as find_path_to_edge passes them.
+"""
+import numpy as np
+
+from . import geometry
+from .navigation import walk_path
+
+_VALID = np.array(geometry.VALID, dtype=bool)
+_CELL_X = geometry.CELL_XY[:, 0]
+_CELL_Y = geometry.CELL_XY[:, 1]
+
+
+def _idealness_grid(direction):
+    """The idealness ShortestPathFinder._get_idealness gives every location that is not an endpoint, -1 off the board
+    """
+    x, y = np.meshgrid(np.arange(geometry.ARENA_SIZE), np.arange(geometry.ARENA_SIZE), indexing="ij")
+    idealness = (28 * y if direction[1] == 1 else 28 * (27 - y)) + (x if direction[0] == 1 else 27 - x)
+    return np.where(_VALID, idealness, -1)
+
+
+def blocked_stack(game_maps):
+    """Stacks the blocked locations of some GameMaps
+
+    Args:
+        game_maps: GameMaps, for instance those of forks trying out different layouts
+
+    Returns:
+        A bool array of shape (boards, ARENA_SIZE, ARENA_SIZE), True where a structure is
+
+    """
+    return np.stack([game_map.structure_type >= 0 for game_map in game_maps])
+
+
+def _spread(mask):
+    """The locations next to a location in mask, on every board
+    """
+    spread = np.zeros_like(mask)
+    spread[:, 1:, :] |= mask[:, :-1, :]
+    spread[:, :-1, :] |= mask[:, 1:, :]
+    spread[:, :, 1:] |= mask[:, :, :-1]
+    spread[:, :, :-1] |= mask[:, :, 1:]
+    return spread
+
+
+def distance_fields(blocked, start, end_points):
+    """Finds the distance fields ShortestPathFinder._validate builds for a unit at start, on every board
+
+    Args:
+        blocked: A bool array of shape (boards, ARENA_SIZE, ARENA_SIZE), see blocked_stack
+        start: The [x, y] location of the unit, the same on every board
+        end_points: The locations the unit is trying to reach, should be an edge
+
+    Returns:
+        * fields: An int array shaped like blocked, the distance from each location to the unit's target, -1 if unreachable
+        * targets: An int array of shape (boards, 2). The location of the most ideal tile the unit paths to, 
+          or [-1, -1] if the unit can reach the edge and paths to the nearest end point. Also [-1, -1] if start is blocked.
+
+    """
+    blocked = np.asarray(blocked, dtype=bool)
+    boards = len(blocked)
+    open_cells = _VALID & ~blocked
+    x, y = start
+    end_x, end_y = np.array([[point[0], point[1]] for point in end_points]).T
+    end_mask = np.zeros(blocked.shape[1:], dtype=bool)
+    end_mask[end_x, end_y] = True
+
+    # The pocket of pathable space around the start, grown on every board together
+    pocket = np.zeros_like(blocked)
+    pocket[:, x, y] = open_cells[:, x, y]
+    frontier = pocket
+    while frontier.any():
+        frontier = _spread(frontier) & open_cells & ~pocket
+        pocket |= frontier
+
+    # Every end point is seeded if one is in the pocket, otherwise the most ideal location of the pocket
+    to_edge = (pocket & end_mask).reshape(boards, -1).any(axis=1)
+    if [x, y] in end_points:
+        to_edge |= pocket[:, x, y]
+    direction = (-1 if end_points[0][0] < geometry.HALF_ARENA else 1, -1 if end_points[0][1] < geometry.HALF_ARENA else 1)
+    idealness = np.where(pocket, _idealness_grid(direction), -1).reshape(boards, -1)
+    most_ideal = idealness.argmax(axis=1)
+    ideal_board = ~to_edge & (idealness.max(axis=1) >= 0)
+    targets = np.full((boards, 2), -1, dtype=np.int64)
+    targets[ideal_board, 0], targets[ideal_board, 1] = np.divmod(most_ideal[ideal_board], geometry.ARENA_SIZE)
+
+    seeds = np.zeros_like(blocked)
+    seeds[to_edge] = end_mask
+    seeds[ideal_board, targets[ideal_board, 0], targets[ideal_board, 1]] = True
+
+    # Breadth first search from the seeds. Blocked end points are seeded, but nothing is reached through them
+    fields = np.where(seeds, 0, -1)
+    frontier = seeds & open_cells
+    length = 0
+    while frontier.any():
+        length += 1
+        frontier = _spread(frontier) & open_cells & (fields < 0)
+        fields[frontier] = length
+    return fields, targets
+
+
+def navigate_boards(blocked, start, end_points):
+    """Finds the path a unit at start would take on every board
+
+    Args:
+        blocked: A bool array of shape (boards, ARENA_SIZE, ARENA_SIZE), see blocked_stack
+        start: The [x, y] location of the unit, the same on every board
+        end_points: The locations the unit is trying to reach, should be an edge
+
+    Returns:
+        A list with the path on each board, as ShortestPathFinder.navigate_multiple_endpoints returns it. None where start is blocked.
+
+    """
+    blocked = np.asarray(blocked, dtype=bool)
+    fields, _ = distance_fields(blocked, start, end_points)
+    start_cell = geometry.CELL_INDEX[(start[0], start[1])]
+    direction = (-1 if end_points[0][0] < geometry.HALF_ARENA else 1, -1 if end_points[0][1] < geometry.HALF_ARENA else 1)
+    # The walk reads single cells, which is faster from lists indexed by cell
+    cell_fields = fields[:, _CELL_X, _CELL_Y].tolist()
+    cell_blocked = blocked[:, _CELL_X, _CELL_Y].tolist()
+    paths = []
+    for pathlength, blocked_cells in zip(cell_fields, cell_blocked):
+        if blocked_cells[start_cell]:
+            paths.append(None)
+        else:
+            paths.append(walk_path([start[0], start[1]], start_cell, pathlength, blocked_cells, direction))
+    return paths
@@ -0,0 +1,241 @@
+"""
+Timings for the parts of gamelib that run on every message from the game engine.
+Not used by the algo itself, run it from the python-algo folder with
+
+    python3 -m gamelib.benchmarks [path/to/game.replay]
+
+Given a replay file saved by the engine, the config, turn and action frame messages in it are used.
+Otherwise a turn with a full board and a phase worth of action frames are generated.
+"""
+import random
+import sys
+import timeit
+
+from . import codec, geometry
+from .algocore import message_type
+from .game_state import GameState
+from .game_map import GameMap
+from .rules import ruleset
+from .unit import GameUnit
+from .navigation import ShortestPathFinder, FlatPathFinder, DynamicPathField
+from .batch_navigation import navigate_boards, blocked_stack
+
+
+def _unit_lists(rng, count, y_range):
+    units = [[] for _ in range(8)]
+    for _ in range(count):
+        y = rng.randrange(*y_range)
+        x = rng.randrange(13 - min(y, 27 - y), 15 + min(y, 27 - y))
+        units[rng.randrange(3)].append([x, y, float(rng.randrange(1, 121)), str(rng.randrange(1, 10 ** 6))])
+    return units
+
+
+def sample_config():
+    """A config with the unit types and resources of a default game, enough to parse the sample messages
+    """
+    structures = [("FF", 1.0, 60.0, 0), ("EF", 4.0, 30.0, 0), ("DF", 2.0, 75.0, 2.5)]
+    walkers = [("PI", 1.0, 15.0, 3.5), ("EI", 3.0, 5.0, 4.5), ("SI", 1.0, 40.0, 4.5)]
+    unit_information = [{"shorthand": shorthand, "unitCategory": 0, "cost1": cost, "startHealth": health,
+                         "attackRange": attack_range, "getHitRadius": 0.51, "upgrade": {}}
+                        for shorthand, cost, health, attack_range in structures]
+    unit_information += [{"shorthand": shorthand, "unitCategory": 1, "cost2": cost, "startHealth": health,
+                          "attackRange": attack_range, "getHitRadius": 0.51, "speed": 1}
+                         for shorthand, cost, health, attack_range in walkers]
+    unit_information += [{"shorthand": "RM", "getHitRadius": 0.51}, {"shorthand": "UP", "getHitRadius": 0.51}]
+    return {"unitInformation": unit_information,
+            "resources": {"bitsPerRound": 5.0, "coresPerRound": 5.0, "bitGrowthRate": 1.0, "bitDecayPerRound": 0.25,
+                          "turnIntervalForBitSchedule": 10}}
+
+
+def sample_messages(seed=0, structures=120, frames=200):
+    """Generates engine messages shaped like those of a late game turn
+
+    Args:
+        seed: The seed for the random board
+        structures: How many structures each player has
+        frames: How many action frames to generate
+
+    Returns:
+        A list of turn messages and a list of action frame messages, as json strings
+
+    """
+    rng = random.Random(seed)
+    stats = [30.0, 12.5, 9.0, 1500]
+    turn = {
+        "p1Units": _unit_lists(rng, structures, (0, 14)),
+        "p2Units": _unit_lists(rng, structures, (14, 28)),
+        "turnInfo": [0, 20, -1, 0],
+        "p1Stats": stats,
+        "p2Stats": stats,
+        "events": {name: [] for name in ("selfDestruct", "breach", "damage", "shield", "move",
+                                        "spawn", "death", "attack", "melee")},
+    }
+    turns = [codec.dumps(turn)]
+    frame_messages = []
+    for frame in range(frames):
+        turn["turnInfo"] = [1, 20, frame, frame * 100]
+        turn["events"]["move"] = [[[13, y], [13, y + 1], [0, 0], 3, str(y), 1] for y in range(rng.randrange(5, 30))]
+        turn["events"]["attack"] = [[[13, y], [14, y], 6.0, 2, str(y), str(y + 1), 1] for y in range(rng.randrange(0, 10))]
+        turn["events"]["damage"] = [[[14, y], 6.0, 0, str(y + 1), 2] for y in range(rng.randrange(0, 10))]
+        frame_messages.append(codec.dumps(turn))
+    return turns, frame_messages
+
+
+def load_replay(path):
+    """Reads the turn and action frame messages from a replay file saved by the game engine
+
+    Args:
+        path: The replay file, one json message per line
+
+    Returns:
+        A list of turn messages and a list of action frame messages, as json strings
+
+    """
+    turns, frames = [], []
+    with open(path) as replay:
+        for line in replay:
+            state_type = message_type(line)
+            if state_type == 0:
+                turns.append(line)
+            elif state_type == 1:
+                frames.append(line)
+    return turns, frames
+
+
+def load_replay_config(path):
+    """Reads the config from a replay file saved by the game engine, sample_config() if it has none
+    """
+    with open(path) as replay:
+        for line in replay:
+            if message_type(line) is None and "unitInformation" in line:
+                return codec.loads(line)
+    return sample_config()
+
+
+def time_per_call(function, arguments, number=5):
+    """Gets the best time in microseconds of calling function once for each of the arguments, averaged over the arguments
+    """
+    best = min(timeit.repeat(lambda: [function(argument) for argument in arguments], number=1, repeat=number))
+    return best / max(len(arguments), 1) * 1e6
+
+
+def benchmark_codecs(turns, frames):
+    """Times every installed json backend on the given messages, and write_commands and encode_commands against them
+
+    Returns:
+        A list of (name, microseconds per call) rows
+
+    """
+    rows = []
+    for name, (loads, _) in sorted(codec.BACKENDS.items()):
+        rows.append(("{} loads turn".format(name), time_per_call(loads, turns)))
+        rows.append(("{} loads frame".format(name), time_per_call(loads, frames)))
+    rng = random.Random(0)
+    stacks = [[("SI", rng.randrange(28), rng.randrange(14)) for _ in range(40)] for _ in range(100)]
+    for name, (_, dumps) in sorted(codec.BACKENDS.items()):
+        rows.append(("{} dumps commands".format(name), time_per_call(dumps, stacks)))
+    rows.append(("write_commands", time_per_call(codec.write_commands, stacks)))
+    rows.append(("encode_commands", time_per_call(codec.encode_commands, stacks)))
+    return rows
+
+
+def benchmark_parsing(config, turns, suffix=""):
+    """Times turning decoded turn messages into a GameState, without and with building its map.
+    The map is also built with one _append_unit call per unit, refreshing a location after each unit, for comparison.
+
+    Returns:
+        A list of (name, microseconds per turn) rows
+
+    """
+    rules = ruleset(config)
+    decoded = [codec.loads(turn) for turn in turns]
+    last_type = rules.type_ids[rules.REMOVE]
+
+    def per_unit(state):
+        game_map = GameMap(config, rules)
+        for player_index, key in enumerate(("p1Units", "p2Units")):
+            for type_index, units in enumerate(state[key][:last_type]):
+                for uinfo in units:
+                    unit = GameUnit(type_index, config, player_index, float(uinfo[2]), int(uinfo[0]), int(uinfo[1]), game_map.units, rules)
+                    game_map._append_unit(unit)
+    return [("GameState" + suffix, time_per_call(lambda state: GameState(config, state, rules), decoded, 20)),
+            ("GameState + map" + suffix, time_per_call(lambda state: GameState(config, state, rules).game_map, decoded, 20)),
+            ("map unit by unit" + suffix, time_per_call(per_unit, decoded, 20))]
+
+
+def benchmark_pathing(config, turns):
+    """Times ShortestPathFinder against FlatPathFinder, pathing from every open location on your edges of each turn's board.
+    find_paths_to_edge paths from a whole edge at once, its time is per location.
+    The walls rows try each open location of row 11 as a wall and path again, their time is per start.
+
+    Returns:
+        A list of (name, microseconds per path) rows
+
+    """
+    queries = []
+    for turn in turns:
+        game_state = GameState(config, turn)
+        game_state.suppress_warnings(True)
+        for edge in (geometry.BOTTOM_LEFT, geometry.BOTTOM_RIGHT):
+            for start in game_state.game_map.get_edge_locations(edge):
+                if not game_state.contains_stationary_unit(start):
+                    end_points = game_state.game_map.get_edge_locations(game_state.get_target_edge(start))
+                    queries.append((start, end_points, game_state))
+    rows = []
+    for finder in (ShortestPathFinder(), FlatPathFinder()):
+        # A new finder per query, so nothing is reused from the previous path
+        finder_type = type(finder)
+        rows.append((finder_type.__name__, time_per_call(lambda query: finder_type().navigate_multiple_endpoints(*query), queries)))
+    game_states = {id(query[2]): query[2] for query in queries}.values()
+    def path_edge(game_state):
+        GameState.path_cache.clear()
+        game_state.fork().find_paths_to_edge(game_state.game_map.get_edge_locations(geometry.BOTTOM_LEFT))
+    many = time_per_call(path_edge, game_states)
+    rows.append(("find_paths_to_edge", many / geometry.HALF_ARENA))
+
+    # Trying every open location of row 11 as a wall, one at a time
+    def try_walls(query, field_type):
+        start, end_points, game_state = query
+        candidates = [[x, 11] for x in range(3, 25) if not game_state.contains_stationary_unit([x, 11]) and [x, 11] != start]
+        if field_type is None:
+            for location in candidates:
+                fork = game_state.fork()
+                fork.game_map.add_unit("FF", location, 0)
+                FlatPathFinder().navigate_multiple_endpoints(start, end_points, fork)
+        else:
+            field = field_type(start, end_points, game_state.game_map.blocked_bits)
+            for location in candidates:
+                field.block(location)
+                field.path()
+                field.unblock(location)
+    some = queries[::max(len(queries) // 10, 1)]
+    rows.append(("walls with fork", time_per_call(lambda query: try_walls(query, None), some)))
+    rows.append(("walls with path_field", time_per_call(lambda query: try_walls(query, DynamicPathField), some)))
+
+    # The same walls as layouts on a stack of boards
+    def walls_batched(query):
+        start, end_points, game_state = query
+        blocked = blocked_stack([game_state.game_map] * 22)
+        for board, x in enumerate(range(3, 25)):
+            blocked[board, x, 11] = [x, 11] != start
+        navigate_boards(blocked, start, end_points)
+    rows.append(("walls batched", time_per_call(walls_batched, some)))
+    return rows
+
+
+def main(argv):
+    turns, frames = load_replay(argv[0]) if argv else sample_messages()
+    config = load_replay_config(argv[0]) if argv else sample_config()
+    print("{} turns, {} frames, loads uses {}".format(len(turns), len(frames), codec.BACKEND))
+    rows = benchmark_codecs(turns, frames)
+    if argv:
+        rows += benchmark_parsing(config, turns)
+    else:
+        rows += benchmark_parsing(config, sample_messages(structures=40, frames=0)[0], " (40)")
+        rows += benchmark_parsing(config, turns, " (120)")
+    for name, microseconds in rows + benchmark_pathing(config, turns[:20]):
+        print("{:<24}{:>10.1f} us".format(name, microseconds))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+"""
+Decoding and encoding of the json messages exchanged with the game engine.
+
+Every message from the engine goes through loads, and every command sent back through encode_commands.
+Both use the fastest json library that is installed, orjson or ujson, and fall back to the json module
+from the standard library, so nothing extra has to be installed for an algo to run.
+
+Attributes :
+    * BACKEND (str): The name of the library loads and dumps use, 'orjson', 'ujson' or 'json'
+    * BACKENDS (dict): Maps the name of every installed library to its (loads, dumps) functions
+    * encode_commands (function): Encodes a build or deploy stack to send to the game engine. 
+      It is the backend's dumps, or write_commands when only the json module is installed
+
+"""
+import json
+
+
+def _json_dumps(obj):
+    return json.dumps(obj)
+
+
+BACKENDS = {'json': (json.loads, _json_dumps)}
+
+try:
+    import ujson
+except ImportError:
+    pass
+else:
+    def _ujson_dumps(obj):
+        return ujson.dumps(obj)
+
+    BACKENDS['ujson'] = (ujson.loads, _ujson_dumps)
+
+try:
+    import orjson
+except ImportError:
+    pass
+else:
+    def _orjson_dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    BACKENDS['orjson'] = (orjson.loads, _orjson_dumps)
+
+BACKEND = next(name for name in ('orjson', 'ujson', 'json') if name in BACKENDS)
+loads, dumps = BACKENDS[BACKEND]
+
+
+def write_commands(commands):
+    """Encodes a build or deploy stack to send to the game engine, without a json library
+
+    The stacks always hold (unit_type, x, y) entries, so this writes them out directly, which is faster 
+    than the json module but slower than orjson or ujson. The output matches json.dumps.
+
+    Args:
+        commands: A list of (unit_type, x, y) tuples or lists, such as GameState._build_stack
+
+    Returns:
+        The commands as a json string
+
+    """
+    encoded = "[" + ", ".join(['["%s", %s, %s]' % (unit_type, x, y) for unit_type, x, y in commands]) + "]"
+    if encoded.count('"') != 2 * len(commands) or '\\' in encoded:
+        # A unit type that needs escaping, let json handle it
+        return json.dumps([list(command) for command in commands])
+    return encoded
+
+
+encode_commands = write_commands if BACKEND == 'json' else dumps
@@ -1,5 +1,9 @@
+import copy
 import math
-from .unit import GameUnit
+import numpy as np
+from . import geometry
+from .rules import ruleset
+from .unit import GameUnit, UnitTable
 from .util import debug_write
 
 class GameMap:
@@ -9,8 +13,26 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    Iterating over the map yields every [x, y] location on the board. Use iter_occupied, 
+    iter_structures or iter_units to only visit locations or units that are actually there.
+    locations_of answers "where are all of a player's units of a type" from an index 
+    that is updated along with the map.
+
+    fork() returns a copy of the map that shares its unit lists with the original until 
+    either of them edits a location with add_unit, remove_unit or game_map[x, y] = units. 
+    The lists and units returned by game_map[x, y] may be shared, so edit the map through 
+    those functions rather than changing the lists in place.
+
+    Edits made through those functions between begin() and rollback() are undone by the rollback.
+
+    Alongside the unit lists, the map keeps dense NumPy planes indexed by [x, y] 
+    (or [player_index, x, y]) which are kept in sync by add_unit, remove_unit, 
+    game_map[x, y] = units and the GameState parser. They can be read directly 
+    for whole board queries, but should not be written to.
+
     Attributes :
         * config (JSON): Contains information about the current game rules
+        * rules (RuleSet): The rules compiled from config
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
         * ARENA_SIZE (int): The size of the arena.
         * HALF_ARENA (int): Half of the size of the arena.
@@ -18,25 +40,66 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * structure_type (ndarray): The unit type index of the structure at each location, -1 if there is none
+        * structure_owner (ndarray): The player index owning the structure at each location, -1 if there is none
+        * structure_health (ndarray): The health of the structure at each location, 0 if there is none
+        * structure_upgraded (ndarray): True where the structure at a location is upgraded
+        * structure_row (ndarray): The row of the structure at each location in the units table, -1 if there is none
+        * units (UnitTable): Column storage for the fields of the units on the map. Each GameUnit on the map is a view of one row. 
+          Forks of a map share its table, each fork's units use their own rows.
+        * mobile_count (ndarray): The number of mobile units each player has at each location, indexed [player_index, x, y]
+        * structure_hash (int): A 64 bit Zobrist hash of the structure layout (type, owner and upgraded at each location)
+        * blocking_hash (int): A 64 bit Zobrist hash of the locations blocked by structures. Boards with the same 
+          blocking_hash path the same way, so it can be used as a cache key.
+        * blocked_bits (int): A bitboard over the cell indices (see geometry) of the locations holding a structure
+        * structure_bits (tuple): Bitboards of the structures controlled by each player, indexed by player_index
+        * type_bits (dict): Bitboards of the structures of each type controlled by each player, keyed by (player_index, type_id)
 
     """
-    def __init__(self, config):
+    def __init__(self, config, rules=None):
         """Initializes constants and game map
 
         Args:
             config (JSON): Contains information about the game
+            rules (RuleSet): The rules compiled from config. Looked up from config if None.
 
         """
         self.config = config
+        self.rules = ruleset(config) if rules is None else rules
         self.enable_warnings = True
-        self.ARENA_SIZE = 28
-        self.HALF_ARENA = int(self.ARENA_SIZE / 2)
-        self.TOP_RIGHT = 0
-        self.TOP_LEFT = 1
-        self.BOTTOM_LEFT = 2
-        self.BOTTOM_RIGHT = 3
+        self.ARENA_SIZE = geometry.ARENA_SIZE
+        self.HALF_ARENA = geometry.HALF_ARENA
+        self.TOP_RIGHT = geometry.TOP_RIGHT
+        self.TOP_LEFT = geometry.TOP_LEFT
+        self.BOTTOM_LEFT = geometry.BOTTOM_LEFT
+        self.BOTTOM_RIGHT = geometry.BOTTOM_RIGHT
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self._owned = None
+        self._undo_log = None
+        self._savepoints = []
+        # The undo log entries recorded before the most recent fork, whose units the fork may share
+        self._shared_log = 0
+        self._occupied = set()
+        self._unit_index = {}
+        self._cell_keys = [frozenset()] * geometry.NUM_CELLS
+        self._structure_keys = [0] * geometry.NUM_CELLS
+        self.structure_hash = 0
+        self.blocking_hash = 0
+        self._structure_ids = [None] * geometry.NUM_CELLS
+        self.blocked_bits = 0
+        self.structure_bits = (0, 0)
+        self.type_bits = {}
+        self._upgraded = (set(), set())
+        self._pending_removal = (set(), set())
+        self._hit_radius = self.rules.hit_radius
+        self._type_index = self.rules.type_ids
+        self.structure_type = np.full((self.ARENA_SIZE, self.ARENA_SIZE), -1, dtype=np.int8)
+        self.structure_owner = np.full((self.ARENA_SIZE, self.ARENA_SIZE), -1, dtype=np.int8)
+        self.structure_health = np.zeros((self.ARENA_SIZE, self.ARENA_SIZE), dtype=np.float64)
+        self.structure_upgraded = np.zeros((self.ARENA_SIZE, self.ARENA_SIZE), dtype=bool)
+        self.structure_row = np.full((self.ARENA_SIZE, self.ARENA_SIZE), -1, dtype=np.int32)
+        self.units = UnitTable()
+        self.mobile_count = np.zeros((2, self.ARENA_SIZE, self.ARENA_SIZE), dtype=np.int16)
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -46,34 +109,359 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
+            self._begin_edit(location[0], location[1], keep_units=False)
             self.__map[location[0]][location[1]] = val
+            self._refresh_cell(location[0], location[1])
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        for x, y in geometry.CELLS:
+            yield [x, y]
+
+    def iter_occupied(self):
+        """Iterates over the locations that hold at least one unit
+
+        Yields:
+            [x, y] locations in the same order as iterating over the map
+
+        """
+        for index in sorted(self._occupied):
+            x, y = geometry.CELLS[index]
+            yield [x, y]
+
+    def iter_structures(self, player_index=None):
+        """Iterates over the structures on the map
+
+        Args:
+            player_index: Only yield structures controlled by this player, 0 for you 1 for the enemy. All players if None.
+
+        Yields:
+            Structure GameUnits in the same order as iterating over the map
+
+        """
+        for x, y in self.iter_occupied():
+            for unit in self.__map[x][y]:
+                if unit.stationary and (player_index is None or unit.player_index == player_index):
+                    yield unit
+
+    def iter_units(self, player_index=None, unit_type=None):
+        """Iterates over the units on the map
+
+        Args:
+            player_index: Only yield units controlled by this player, 0 for you 1 for the enemy. All players if None.
+            unit_type: Only yield units of this type. All types if None.
+
+        Yields:
+            GameUnits in the same order as iterating over the map
+
+        """
+        type_id = None if unit_type is None else self._type_index.get(unit_type)
+        if unit_type is None:
+            locations = self.iter_occupied()
+        elif player_index is None:
+            locations = self.__indexed_locations(self.__index_cells(0, type_id) | self.__index_cells(1, type_id))
+        else:
+            locations = self.__indexed_locations(self.__index_cells(player_index, type_id))
+        for x, y in locations:
+            for unit in self.__map[x][y]:
+                if (player_index is None or unit.player_index == player_index) and (type_id is None or unit.type_id == type_id):
+                    yield unit
+
+    def locations_of(self, player_index, unit_type):
+        """Gets the locations holding units of a given type controlled by a given player.
+        Answered from an index kept up to date as the map changes, so the cost depends only on the number of matches.
+
+        Args:
+            player_index: The player controlling the units, 0 for you 1 for the enemy
+            unit_type: The type of the units, WALL, SCOUT, etc.
+
+        Returns:
+            A list of [x, y] locations in the same order as iterating over the map
+
+        """
+        return self.__indexed_locations(self.__index_cells(player_index, self._type_index.get(unit_type)))
+
+    def upgraded_locations(self, player_index):
+        """Gets the locations of a player's upgraded structures
+
+        Args:
+            player_index: The player controlling the structures, 0 for you 1 for the enemy
+
+        Returns:
+            A list of [x, y] locations in the same order as iterating over the map
+
+        """
+        return self.__indexed_locations(self._upgraded[player_index])
+
+    def pending_removal_locations(self, player_index):
+        """Gets the locations of a player's structures that are marked for removal
+
+        Args:
+            player_index: The player controlling the structures, 0 for you 1 for the enemy
+
+        Returns:
+            A list of [x, y] locations in the same order as iterating over the map
+
+        """
+        return self.__indexed_locations(self._pending_removal[player_index])
+
+    def __index_cells(self, player_index, type_id):
+        return self._unit_index.get((player_index, type_id), frozenset())
+
+    def __indexed_locations(self, cells):
+        return [[geometry.CELLS[index][0], geometry.CELLS[index][1]] for index in sorted(cells)]
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[[] for _ in range(self.ARENA_SIZE)] for _ in range(self.ARENA_SIZE)]
+
+    def _refresh_cell(self, x, y):
+        """Recomputes the planes, indexes, bitboards and hashes at [x, y] from the units stored there.
+        Must be called after the list of units at a location, or one of those units, is changed.
+        """
+        (self.structure_type[x, y], self.structure_owner[x, y], self.structure_health[x, y], self.structure_upgraded[x, y],
+         self.structure_row[x, y], self.mobile_count[0, x, y], self.mobile_count[1, x, y]) = self.__refresh_indexes(x, y)
+
+    def __refresh_indexes(self, x, y):
+        """Recomputes the indexes, bitboards and hashes at [x, y], and returns the values of each plane there
+        as a (structure_type, structure_owner, structure_health, structure_upgraded, structure_row, mobile 0, mobile 1) tuple.
+        """
+        cell = self.__map[x][y]
+        table = self.units
+        specs = table.specs
+        owners = table.owner
+        structure = None
+        # units without a player are counted at mobile[-1] and ignored
+        mobile = [0, 0, 0]
+        keys = set()
+        for unit in cell:
+            if unit._table is not table:
+                unit._move_to(table)
+            row = unit._row
+            spec = specs[row]
+            owner = owners[row]
+            keys.add((None if owner < 0 else owner, spec.type_index))
+            if spec.stationary:
+                structure = row
+            else:
+                mobile[owner] += 1
+
+        index = geometry.INDEX_GRID[x][y]
+        if structure is None:
+            planes = (-1, -1, 0, False, -1, mobile[0], mobile[1])
+            new_key = 0
+            new_id = None
+            upgraded = pending_removal = False
+        else:
+            spec = specs[structure]
+            owner = owners[structure]
+            upgraded = table.upgraded[structure]
+            pending_removal = table.pending_removal[structure]
+            planes = (spec.type_index, owner, table.health[structure], upgraded, structure, mobile[0], mobile[1])
+            owner = None if owner < 0 else owner
+            new_key = geometry.zobrist_structure_key(index, spec.type_index, owner, upgraded)
+            new_id = (owner, spec.type_index)
+
+        old_key = self._structure_keys[index]
+        if old_key != new_key:
+            self.structure_hash ^= old_key ^ new_key
+            self._structure_keys[index] = new_key
+            if (old_key == 0) != (new_key == 0):
+                self.blocking_hash ^= geometry.ZOBRIST_BLOCKED[index]
+
+        old_id = self._structure_ids[index]
+        if old_id != new_id:
+            self.__update_bits(index, old_id, new_id)
+
+        if cell:
+            self._occupied.add(index)
+        else:
+            self._occupied.discard(index)
+
+        old_keys = self._cell_keys[index]
+        if old_keys != keys:
+            for key in old_keys:
+                self._unit_index[key].discard(index)
+            for key in keys:
+                cells = self._unit_index.get(key)
+                if cells is None:
+                    self._unit_index[key] = {index}
+                else:
+                    cells.add(index)
+            self._cell_keys[index] = keys
+
+        # Only locations holding a structure are in the upgraded and pending removal sets
+        if new_id is not None and (new_id[0] == 0 or new_id[0] == 1):
+            player_index = new_id[0]
+            (self._upgraded[player_index].add if upgraded else self._upgraded[player_index].discard)(index)
+            (self._pending_removal[player_index].add if pending_removal else self._pending_removal[player_index].discard)(index)
+            if old_id is not None and old_id[0] != player_index:
+                self._upgraded[1 - player_index].discard(index)
+                self._pending_removal[1 - player_index].discard(index)
+        elif old_id is not None:
+            for player_index in (0, 1):
+                self._upgraded[player_index].discard(index)
+                self._pending_removal[player_index].discard(index)
+        return planes
+
+    def __update_bits(self, index, old_id, new_id):
+        bit = geometry.CELL_BITS[index]
+        self._structure_ids[index] = new_id
+        if old_id is not None:
+            self.type_bits[old_id] &= ~bit
+        if new_id is not None:
+            self.type_bits[new_id] = self.type_bits.get(new_id, 0) | bit
+        if new_id is None:
+            self.blocked_bits &= ~bit
+        else:
+            self.blocked_bits |= bit
+
+        structure_bits = list(self.structure_bits)
+        if old_id is not None and (old_id[0] == 0 or old_id[0] == 1):
+            structure_bits[old_id[0]] &= ~bit
+        if new_id is not None and (new_id[0] == 0 or new_id[0] == 1):
+            structure_bits[new_id[0]] |= bit
+        self.structure_bits = tuple(structure_bits)
+
+    def fork(self):
+        """Creates a copy of this map for trying out hypothetical changes.
+        Unit lists are shared between the two maps and only copied when one of them edits a location.
+
+        Returns:
+            A new GameMap with the same units as this one
+
+        """
+        clone = copy.copy(self)
+        clone.__map = [column[:] for column in self.__map]
+        if self._undo_log is not None:
+            self._shared_log = len(self._undo_log)
+        self._owned = set()
+        clone._owned = set()
+        clone._undo_log = None
+        clone._savepoints = []
+        clone._shared_log = 0
+        clone._occupied = set(self._occupied)
+        clone._unit_index = {key: set(cells) for key, cells in self._unit_index.items()}
+        clone._cell_keys = list(self._cell_keys)
+        clone._structure_keys = list(self._structure_keys)
+        clone._structure_ids = list(self._structure_ids)
+        clone.type_bits = dict(self.type_bits)
+        clone._upgraded = (set(self._upgraded[0]), set(self._upgraded[1]))
+        clone._pending_removal = (set(self._pending_removal[0]), set(self._pending_removal[1]))
+        clone.structure_type = self.structure_type.copy()
+        clone.structure_owner = self.structure_owner.copy()
+        clone.structure_health = self.structure_health.copy()
+        clone.structure_upgraded = self.structure_upgraded.copy()
+        clone.structure_row = self.structure_row.copy()
+        clone.mobile_count = self.mobile_count.copy()
+        return clone
+
+    def _begin_edit(self, x, y, keep_units=True):
+        """Records the units at [x, y] in the undo log, and copies them if they are shared with another fork of this map.
+        Must be called before the list of units at a location, or one of those units, is changed.
+        Callers that replace the list with a new one pass keep_units=False, so shared units are not copied only to be thrown away.
+        """
+        index = geometry.INDEX_GRID[x][y]
+        owned = self._owned is None or index in self._owned
+        if self._undo_log is not None:
+            cell = self.__map[x][y]
+            self._undo_log.append((x, y, cell, list(cell), [unit._snapshot() for unit in cell], owned))
+        if not owned:
+            if keep_units:
+                self.__map[x][y] = [copy.copy(unit) for unit in self.__map[x][y]]
+            self._owned.add(index)
+
+    def begin(self):
+        """Starts recording edits so they can be undone with rollback().
+        Calls can be nested, each rollback() or commit() ends the most recent begin().
+        """
+        if self._undo_log is None:
+            self._undo_log = []
+        self._savepoints.append(len(self._undo_log))
+
+    def rollback(self):
+        """Undoes every edit made since the most recent begin().
+        The cost depends on the number of edits, not the size of the map.
+        Locations a fork was made from since begin() get copies of their units, so the fork keeps its own.
+        """
+        if not self._savepoints:
+            self.warn("Called rollback without a matching begin.")
+            return
+        savepoint = self._savepoints.pop()
+        while len(self._undo_log) > savepoint:
+            x, y, cell, units, states, owned = self._undo_log.pop()
+            if len(self._undo_log) < self._shared_log:
+                # A fork made since this edit shares the list and units, so they are restored as new copies
+                cell = units = [copy.copy(unit) for unit in units]
+                owned = True
+            else:
+                cell[:] = units
+            for unit, state in zip(units, states):
+                unit._restore(state)
+            self.__map[x][y] = cell
+            if not owned:
+                self._owned.discard(geometry.INDEX_GRID[x][y])
+            elif self._owned is not None:
+                self._owned.add(geometry.INDEX_GRID[x][y])
+            self._refresh_cell(x, y)
+        self._shared_log = min(self._shared_log, savepoint)
+        if not self._savepoints:
+            self._undo_log = None
+
+    def commit(self):
+        """Keeps every edit made since the most recent begin().
+        If it is nested inside another begin(), an outer rollback() can still undo them.
+        """
+        if not self._savepoints:
+            self.warn("Called commit without a matching begin.")
+            return
+        self._savepoints.pop()
+        if not self._savepoints:
+            self._undo_log = None
+            self._shared_log = 0
+
+    def _upgrade_structure(self, x, y):
+        """Upgrades the structure at [x, y]. Callers check that it can be upgraded first, 
+        so attempts that fail do not copy the location or add to the undo log.
+        """
+        self._begin_edit(x, y)
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                structure = unit
+        structure.upgrade()
+        self._refresh_cell(x, y)
+
+    def _append_unit(self, unit):
+        """Appends an existing GameUnit to the list of units at its own location.
+        Used by TurnTracker when rebuilding a location, see _load_units for adding a whole board.
+        """
+        x, y = unit.x, unit.y
+        self._begin_edit(x, y)
+        self.__map[x][y].append(unit)
+        self._refresh_cell(x, y)
+
+    def _load_units(self, units):
+        """Appends many existing GameUnits to the lists of units at their own locations.
+        Used by GameState when parsing a whole board, where refreshing each location after every unit is slow.
+        Each location is refreshed once after all the units are added, and the planes are written in one assignment.
+        """
+        touched = {}
+        for unit in units:
+            location = (unit.x, unit.y)
+            if location not in touched:
+                self._begin_edit(*location)
+                touched[location] = None
+            self.__map[location[0]][location[1]].append(unit)
+        if not touched:
+            return
+        planes = np.array([self.__refresh_indexes(x, y) for x, y in touched]).T
+        xs, ys = np.array(list(touched)).T
+        self.structure_type[xs, ys] = planes[0]
+        self.structure_owner[xs, ys] = planes[1]
+        self.structure_health[xs, ys] = planes[2]
+        self.structure_upgraded[xs, ys] = planes[3]
+        self.structure_row[xs, ys] = planes[4]
+        self.mobile_count[:, xs, ys] = planes[5:]
 
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
@@ -88,20 +476,7 @@ class GameMap:
             True if the location is on the board, False otherwise
         
         """
-        x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        return geometry.in_bounds(location)
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -117,8 +492,23 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [[x, y] for x, y in geometry.EDGES[quadrant_description]]
+
+    def is_on_edge(self, location, quadrant_description=None):
+        """Checks if a location is on an edge.
+
+        Args:
+            location: A map location
+            quadrant_description: One of the edge constants, see game_map.TOP_LEFT and similar. Any edge if None.
+
+        Returns:
+            True if the location is on the given edge, False otherwise
+
+        """
+        x, y = location
+        if quadrant_description is None:
+            return any((x, y) in edge for edge in geometry.EDGE_SETS)
+        return (x, y) in geometry.EDGE_SETS[quadrant_description]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -127,27 +517,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[[x, y] for x, y in edge] for edge in geometry.EDGES]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -167,11 +537,13 @@ class GameMap:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
-        new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
+        new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1], self.units, self.rules)
+        self._begin_edit(x, y, keep_units=not new_unit.stationary)
         if not new_unit.stationary:
             self.__map[x][y].append(new_unit)
         else:
             self.__map[x][y] = [new_unit]
+        self._refresh_cell(x, y)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -186,7 +558,29 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
+        self._begin_edit(x, y, keep_units=False)
         self.__map[x][y] = []
+        self._refresh_cell(x, y)
+
+    def structure_mask(self, player_index=None, unit_type=None):
+        """Gets a boolean plane of the locations holding matching structures
+
+        Args:
+            player_index: Only include structures owned by this player, 0 for you 1 for the enemy. All players if None.
+            unit_type: Only include structures of this type, WALL, TURRET, etc. All types if None.
+
+        Returns:
+            A 28x28 boolean ndarray indexed [x, y]. For example, game_map.structure_mask(1, TURRET)[:, 14].sum()
+            is the number of enemy turrets on row 14.
+
+        """
+        if unit_type is None:
+            mask = self.structure_type >= 0
+        else:
+            mask = self.structure_type == self._type_index.get(unit_type, -2)
+        if player_index is not None:
+            mask &= self.structure_owner == player_index
+        return mask
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -198,23 +592,43 @@ class GameMap:
         Returns:
             The locations that are within our search area
 
+        """
+        cells = geometry.CELLS
+        return [[cells[index][0], cells[index][1]] for index in self.get_cells_in_range(location, radius)]
+
+    def get_cells_in_range(self, location, radius):
+        """Gets the cell indices in a circular area around a location.
+        Results for locations on the board are cached, so repeated queries are a table lookup.
+
+        Args:
+            location: The center of our search area
+            radius: The radius of our search area
+
+        Returns:
+            A tuple of cell indices (see geometry.CELLS) that are within our search area
+
         """
         if radius < 0 or radius > self.ARENA_SIZE:
             self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
-        if not self.in_arena_bounds(location):
-            self._invalid_coordinates(location)
-
+        # Looked up by value, so float locations such as [13.0, 6.0] find their cell too
+        index = geometry.CELL_INDEX.get((location[0], location[1]))
+        if index is None:
+            # Off the board, or between locations like [13.5, 6], so there is no cached result
+            if not self.in_arena_bounds([round(location[0]), round(location[1])]):
+                self._invalid_coordinates(location)
+            return self.__search_cells_in_range(location, radius)
+        return geometry.cells_in_range(index, radius, self._hit_radius)
+
+    def __search_cells_in_range(self, location, radius):
         x, y = location
-        locations = []
+        cells = []
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
-                new_location = [i, j]
                 # A unit with a given range affects all locations whose centers are within that range + get hit radius
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
-                    locations.append(new_location)
-        return locations
+                if self.in_arena_bounds([i, j]) and self.distance_between_locations(location, [i, j]) < radius + self._hit_radius:
+                    cells.append(geometry.INDEX_GRID[i][j])
+        return tuple(cells)
 
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
@@ -232,6 +646,71 @@ class GameMap:
 
         return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
+    def sum_structure_health(self, locations, player_index=None):
+        """Adds up the current health of the structures at the given locations, 
+        as a single vectorized reduction over the units table
+
+        Args:
+            locations: A list of [x, y] locations. A location listed twice is counted twice.
+            player_index: Only count structures controlled by this player, 0 for you 1 for the enemy. All players if None.
+
+        Returns:
+            The total health as a float
+
+        """
+        cells = self.cell_indices(locations)
+        cells = cells[cells >= 0]
+        xy = geometry.CELL_XY[cells]
+        rows = self.structure_row[xy[:, 0], xy[:, 1]]
+        rows = rows[rows >= 0]
+        health = self.units.column("health", rows)
+        if player_index is not None:
+            health = health[self.units.column("owner", rows) == player_index]
+        return float(health.sum())
+
+    def cell_indices(self, locations):
+        """Converts locations to cell indices, for use with the batched distance functions
+
+        Args:
+            locations: A list of [x, y] locations
+
+        Returns:
+            An integer ndarray of cell indices (see geometry.CELLS), -1 for locations outside the arena
+
+        """
+        return np.array([geometry.CELL_INDEX.get((x, y), -1) for x, y in locations], dtype=np.intp)
+
+    def distance_matrix(self, source_cells, target_cells):
+        """Euclidean distance between every pair of cells, read from a precomputed table
+
+        Args:
+            source_cells: A sequence of cell indices, see cell_indices
+            target_cells: A sequence of cell indices
+
+        Returns:
+            A float ndarray of shape (len(source_cells), len(target_cells))
+
+        """
+        return geometry.DISTANCE[np.ix_(np.asarray(source_cells, dtype=np.intp), np.asarray(target_cells, dtype=np.intp))]
+
+    def in_range_matrix(self, source_cells, target_cells, radius):
+        """Checks which pairs of cells are within a distance of each other, in one vectorized call.
+
+        This compares the distance between the centers of the cells to radius, inclusive, like get_attackers 
+        compares it to attackRange. get_locations_in_range and get_cells_in_range instead include the locations 
+        closer than radius plus the game's getHitRadius, so they can include cells this leaves out.
+
+        Args:
+            source_cells: A sequence of cell indices, see cell_indices
+            target_cells: A sequence of cell indices
+            radius: The maximum distance between cell centers, inclusive
+
+        Returns:
+            A boolean ndarray of shape (len(source_cells), len(target_cells))
+
+        """
+        return self.distance_matrix(source_cells, target_cells) <= radius
+
     def warn(self, message):
         """
         Used internally by game_map to print out default messaging
@@ -1,109 +1,178 @@
 import math
-import json
 import sys
+import copy
+import numpy as np
 
-from .navigation import ShortestPathFinder
+from . import codec, geometry
+from .navigation import FlatPathFinder, PathCache, DynamicPathField
 from .util import send_command, debug_write
 from .unit import GameUnit
 from .game_map import GameMap
+from .rules import ruleset, MP, SP
+from .planner import Plan
 
-def is_stationary(unit_type):
+def is_stationary(unit_type, rules):
     """
         Args:
             unit_type: A unit type
+            rules: The game's RuleSet
         
         Returns: 
             Boolean, True if the unit is stationary, False otherwise.
     """
-    return unit_type in STRUCTURE_TYPES
+    return rules.is_stationary(unit_type)
 
 class GameState:
     """Represents the entire gamestate for a given turn
     Provides methods related to resources and unit deployment
 
     Attributes :
-        * UNIT_TYPE_TO_INDEX (dict): Maps a unit to a corresponding index
-        * WALL (str): A constant representing the wall unit
-        * SUPPORT (str): A constant representing the support unit
-        * TURRET (str): A constant representing the turret unit
-        * SCOUT (str): A constant representing the scout unit
-        * DEMOLISHER (str): A constant representing the demolisher unit
-        * INTERCEPTOR (str): A constant representing the interceptor unit
-        * REMOVE (str): A constant representing removing your own unit
-        * UPGRADE (str): A constant representing upgrading a unit
-        * STRUCTURE_TYPES (list): A list of the structure units
+        * rules (RuleSet): The rules compiled from the config. rules.WALL, rules.SCOUT, rules.REMOVE, etc. 
+          are the unit type constants and rules.STRUCTURE_TYPES lists the structure units
 
         * ARENA_SIZE (int): The size of the arena
         * HALF_ARENA (int): Half the size of the arena
         * MP (int): A constant representing the Mobile Points resource, used in the get_resource function
         * SP (int): A constant representing the SP resource, used in the get_resource function
          
-        * game_map (:obj: GameMap): The current GameMap. To retrieve a list of GameUnits at a location, use game_map[x, y]
+        * game_map (:obj: GameMap): The current GameMap. To retrieve a list of GameUnits at a location, use game_map[x, y]. 
+          It is built from the serialized units the first time it is used, see parse_stats
         * turn_number (int): The current turn number. Starts at 0.
         * my_health (int): Your current remaining health
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
 
+        * parse_stats (dict): Class wide counts of how many GameStates were created ('states') 
+          and how many of them built their game_map ('maps_built'), counting the maps a TurnTracker updated for them. 
+          The rest only needed the turn number, health, time and resources
+        * path_cache (:obj: PathCache): Class wide cache of the paths found by find_path_to_edge and find_paths_to_edge, 
+          shared by every turn and fork. Its hits and misses count how often it was used
+
     """
 
-    def __init__(self, config, serialized_string):
+    parse_stats = {'states': 0, 'maps_built': 0}
+    path_cache = PathCache()
+
+    def __init__(self, config, serialized_string, rules=None):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string or dict): A string containing information about the game state at the start of this turn, 
+              or the same information already decoded with json.loads, as AlgoCore passes it to on_turn
+            * rules (RuleSet): The rules compiled from config, such as AlgoCore.rules. Looked up from config if None.
 
         """
         self.serialized_string = serialized_string
         self.config = config
         self.enable_warnings = True
 
-        global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        WALL = config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[WALL] = 0
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SUPPORT] = 1
-        TURRET = config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[TURRET] = 2
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCOUT] = 3
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DEMOLISHER] = 4
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[INTERCEPTOR] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-        UPGRADE = config["unitInformation"][7]["shorthand"]
-        UNIT_TYPE_TO_INDEX[UPGRADE] = 7
-
-        ALL_UNITS = [SCOUT, DEMOLISHER, INTERCEPTOR, WALL, SUPPORT, TURRET]
-        STRUCTURE_TYPES = [WALL, SUPPORT, TURRET]
-
-        self.ARENA_SIZE = 28
-        self.HALF_ARENA = int(self.ARENA_SIZE / 2)
-        self.MP = 1
-        self.SP = 0
-        global MP, SP
-        MP = self.MP
-        SP = self.SP
-
-        self.game_map = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        self.rules = ruleset(config) if rules is None else rules
+
+        self.ARENA_SIZE = geometry.ARENA_SIZE
+        self.HALF_ARENA = geometry.HALF_ARENA
+        self.MP = MP
+        self.SP = SP
+
+        self._game_map = None
+        self._serialized_units = None
+        self._shortest_path_finder = FlatPathFinder()
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
+        self._savepoints = []
         self.__parse_state(serialized_string)
 
+    def fork(self):
+        """Creates a copy of this GameState for evaluating hypothetical moves.
+        The copy has its own resources, build and deploy stacks and a forked GameMap, 
+        so spawning, upgrading or removing on it leaves this GameState untouched. 
+        Nothing is re-parsed, and map locations are only copied when the fork edits them. 
+        If the game_map has not been built yet, the copy builds its own the first time it is used.
+
+        Returns:
+            A new GameState in the same state as this one
+
+        """
+        clone = copy.copy(self)
+        if self._game_map is not None:
+            clone._game_map = self._game_map.fork()
+        clone._shortest_path_finder = FlatPathFinder()
+        clone._build_stack = list(self._build_stack)
+        clone._deploy_stack = list(self._deploy_stack)
+        clone._player_resources = [dict(resources) for resources in self._player_resources]
+        clone._savepoints = []
+        return clone
+
+    @property
+    def game_map(self):
+        if self._game_map is None:
+            self.__build_map()
+        return self._game_map
+
+    @game_map.setter
+    def game_map(self, game_map):
+        self._game_map = game_map
+        self._serialized_units = None
+
+    def __build_map(self):
+        """
+        Creates the GameMap and adds the units kept aside by __parse_state.
+        """
+        self._game_map = GameMap(self.config, self.rules)
+        self._game_map.enable_warnings = self.enable_warnings
+        GameState.parse_stats['maps_built'] += 1
+        if self._serialized_units is not None:
+            p1units, p2units = self._serialized_units
+            self._serialized_units = None
+            self.__create_parsed_units(p1units, 0)
+            self.__create_parsed_units(p2units, 1)
+
+    def begin(self):
+        """Starts a hypothetical edit. Everything attempt_spawn, attempt_upgrade, attempt_remove and 
+        game_map.add_unit/remove_unit change from here on can be undone with rollback(), 
+        or kept with commit(). Calls can be nested, each rollback() or commit() ends the most recent begin().
+        """
+        self._savepoints.append((
+            [dict(resources) for resources in self._player_resources],
+            len(self._build_stack),
+            len(self._deploy_stack)))
+        self.game_map.begin()
+
+    def rollback(self):
+        """Undoes everything changed since the most recent begin(): map locations, resources and the build and deploy stacks.
+        The cost depends on the number of changes, the board is not copied.
+        """
+        if not self._savepoints:
+            self.warn("Called rollback without a matching begin.")
+            return
+        resources, build_length, deploy_length = self._savepoints.pop()
+        self._player_resources = resources
+        del self._build_stack[build_length:]
+        del self._deploy_stack[deploy_length:]
+        self.game_map.rollback()
+
+    def commit(self):
+        """Keeps everything changed since the most recent begin().
+        If it is nested inside another begin(), an outer rollback() can still undo the changes.
+        """
+        if not self._savepoints:
+            self.warn("Called commit without a matching begin.")
+            return
+        self._savepoints.pop()
+        self.game_map.commit()
+
     def __parse_state(self, state_line):
         """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        Reads the turn number, health, time and resources from the serialized game state. 
+        The units are kept until game_map is first used, see __build_map.
+        state_line is the game state as a json string, or a dict if it was already decoded.
         """
-        state = json.loads(state_line)
+        GameState.parse_stats['states'] += 1
+        state = codec.loads(state_line) if isinstance(state_line, str) else state_line
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -120,37 +189,54 @@ class GameState:
             {'SP': p1_SP, 'MP': p1_MP},
             {'SP': p2_SP, 'MP': p2_MP}]
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
-
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
+        self._serialized_units = (state["p1Units"], state["p2Units"])
 
     def __create_parsed_units(self, units, player_number):
         """
-        Helper function for __parse_state to add units to the map.
+        Helper function for __build_map to add units to the map.
         """
-        typedef = self.config.get("unitInformation")
-        for i, unit_types in enumerate(units):
+        rules = self.rules
+        config = self.config
+        game_map = self._game_map
+        table = game_map.units
+        remove_id = rules.type_ids[rules.REMOVE]
+        upgrade_id = rules.type_ids[rules.UPGRADE]
+        parsed = []
+        for type_id, unit_types in enumerate(units):
+            if parsed and (type_id == remove_id or type_id == upgrade_id):
+                # Removals and upgrades refer to the structures parsed before them
+                game_map._load_units(parsed)
+                parsed = []
             for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
                 sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
+                x, y = int(sx), int(sy)
                 hp = float(shp)
                 # This depends on RM and UP always being the last types to be processed
-                if unit_type == REMOVE:
+                if type_id == remove_id:
                     # Quick fix will deploy engine fix soon
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
-                elif unit_type == UPGRADE:
+                        game_map[x,y][0].pending_removal = True
+                        game_map._refresh_cell(x, y)
+                elif type_id == upgrade_id:
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                        game_map[x,y][0].upgrade()
+                        game_map._refresh_cell(x, y)
                 else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    parsed.append(GameUnit(type_id, config, player_number, hp, x, y, table, rules))
+        game_map._load_units(parsed)
 
     def __resource_required(self, unit_type):
-        return self.SP if is_stationary(unit_type) else self.MP
+        return self.SP if self.rules.is_stationary(unit_type) else self.MP
+
+    def __spawnable_type_id(self, unit_type):
+        """
+        Gets the type id of a unit type that can be spawned, or None after warning if it can't.
+        """
+        type_id = self.rules.type_ids.get(unit_type)
+        if type_id is None or not self.rules.spawnable[type_id]:
+            self._invalid_unit(unit_type)
+            return None
+        return type_id
 
     def __set_resource(self, resource_type, amount, player_index=0):
         """
@@ -175,8 +261,8 @@ class GameState:
         """Submit and end your turn.
             Must be called at the end of your turn or the algo will hang.
         """
-        build_string = json.dumps(self._build_stack)
-        deploy_string = json.dumps(self._deploy_stack)
+        build_string = codec.encode_commands(self._build_stack)
+        deploy_string = codec.encode_commands(self._deploy_stack)
         send_command(build_string)
         send_command(deploy_string)
 
@@ -234,11 +320,11 @@ class GameState:
             The number of units affordable of the given unit_type.
 
         """
-        if unit_type not in ALL_UNITS:
-            self._invalid_unit(unit_type)
+        type_id = self.__spawnable_type_id(unit_type)
+        if type_id is None:
             return
 
-        costs = self.type_cost(unit_type)
+        costs = self.rules.costs[type_id]
         player_held = self.get_resources()
         if costs[MP] > 0 and costs[SP] > 0:
             return min(math.floor(player_held[SP] / costs[SP]), math.floor(player_held[MP] / costs[MP]))
@@ -270,18 +356,34 @@ class GameState:
         if type(current_MP) == int and current_MP < 0:
             self.warn("Invalid current MP ({}). Current MP cannot be negative.".format(current_MP))
 
+        rules = self.rules
         MP = self.get_resource(self.MP, player_index) if not current_MP else current_MP
         for increment in range(1, turns_in_future + 1):
             current_turn = self.turn_number + increment
-            MP *= (1 - self.config["resources"]["bitDecayPerRound"])
-            MP_per_round = self.config["resources"]["bitsPerRound"]
-            MP_ramp_ups = current_turn // self.config["resources"]["turnIntervalForBitSchedule"]
-            MP_per_round_growth = self.config["resources"]["bitGrowthRate"]
-            MP_gained = MP_per_round + (MP_per_round_growth * MP_ramp_ups)
-            MP += MP_gained
+            MP *= (1 - rules.bit_decay_per_round)
+            MP += rules.MP_gained(current_turn)
             MP = round(MP, 1)
         return MP
 
+    def project_future_resources(self, turns_in_future=1):
+        """Predicts the resources of both players over the next turns, ignoring resources gained by dealing damage
+
+        Args:
+            turns_in_future: The number of turns to look forward
+
+        Returns:
+            An ndarray indexed [player_index, resource_type, turn], where resource_type is SP (0) or MP (1) 
+            and turn 0 is the next turn. The MP entries match project_future_MP. 
+            To project other starting amounts, or many at once, use rules.projection.
+
+        """
+        rules = self.rules
+        held = [self.get_resources(player_index) for player_index in (0, 1)]
+        projected = np.empty((2, 2, turns_in_future))
+        projected[:, SP] = rules.projection.project_SP([resources[SP] for resources in held], self.turn_number, turns_in_future)
+        projected[:, MP] = rules.projection.project_MP([resources[MP] for resources in held], self.turn_number, turns_in_future)
+        return projected
+
     def type_cost(self, unit_type, upgrade=False):
         """Gets the cost of a unit based on its type
 
@@ -292,16 +394,14 @@ class GameState:
             The units costs as a list [SP, MP]
 
         """
-        if unit_type == REMOVE:
+        if unit_type == self.rules.REMOVE:
             self._invalid_unit(unit_type)
             return
         
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
-        cost_base = [unit_def.get('cost1', 0), unit_def.get('cost2', 0)]
+        type_id = self.rules.type_ids[unit_type]
         if upgrade:
-            return [unit_def.get('upgrade', {}).get('cost1', cost_base[SP]), unit_def.get('upgrade', {}).get('cost2', cost_base[MP])]
-
-        return cost_base
+            return list(self.rules.upgrade_costs[type_id])
+        return list(self.rules.costs[type_id])
 
 
     def can_spawn(self, unit_type, location, num=1):
@@ -320,20 +420,21 @@ class GameState:
             True if we can spawn the unit(s)
 
         """
-        if unit_type not in ALL_UNITS:
-            self._invalid_unit(unit_type)
+        type_id = self.__spawnable_type_id(unit_type)
+        if type_id is None:
             return
         
-        if not self.game_map.in_arena_bounds(location):
+        if not geometry.in_bounds(location):
             if self.enable_warnings:
                 self.warn("Could not spawn {} at location {}. Location invalid.".format(unit_type, location))
             return False
 
         affordable = self.number_affordable(unit_type) >= num
-        stationary = is_stationary(unit_type)
-        blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
+        stationary = self.rules.is_structure[type_id]
+        index = geometry.CELL_INDEX[(location[0], location[1])]
+        blocked = bool(self.game_map.blocked_bits & geometry.CELL_BITS[index]) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = (location[0], location[1]) in geometry.SPAWN_EDGE_SET
 
         if self.enable_warnings:
             fail_reason = ""
@@ -364,9 +465,11 @@ class GameState:
             The number of units successfully spawned
 
         """
-        if unit_type not in ALL_UNITS:
-            self._invalid_unit(unit_type)
+        type_id = self.__spawnable_type_id(unit_type)
+        if type_id is None:
             return
+        stationary = self.rules.is_structure[type_id]
+        costs = self.rules.costs[type_id]
         if num < 1 or not locations:
             self.warn("Attempted to spawn fewer than one units! ({})".format(num))
             return
@@ -378,11 +481,10 @@ class GameState:
             for i in range(num):
                 if self.can_spawn(unit_type, location, 1):
                     x, y = map(int, location)
-                    costs = self.type_cost(unit_type)
                     self.__set_resource(SP, 0 - costs[SP])
                     self.__set_resource(MP, 0 - costs[MP])
                     self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
+                    if stationary:
                         self._build_stack.append((unit_type, x, y))
                     else:
                         self._deploy_stack.append((unit_type, x, y))
@@ -407,7 +509,7 @@ class GameState:
         for location in locations:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
-                self._build_stack.append((REMOVE, x, y))
+                self._build_stack.append((self.rules.REMOVE, x, y))
                 removed_units += 1
             else:
                 self.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.".format(location))
@@ -439,19 +541,37 @@ class GameState:
                     if unit.stationary:
                         existing_unit = unit
 
-                if not existing_unit.upgraded and self.config["unitInformation"][UNIT_TYPE_TO_INDEX[existing_unit.unit_type]].get("upgrade", None) is not None:
-                    costs = self.type_cost(existing_unit.unit_type, True)
+                type_id = existing_unit.type_id
+                if not existing_unit.upgraded and self.rules.upgradable[type_id]:
+                    costs = self.rules.upgrade_costs[type_id]
                     resources = self.get_resources()
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
-                        self._build_stack.append((UPGRADE, x, y))
+                        self.game_map._upgrade_structure(x, y)
+                        self._build_stack.append((self.rules.UPGRADE, x, y))
                         spawned_units += 1
             else:
                 self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
         return spawned_units
 
+    def plan(self, actions):
+        """Works out a list of spawns, upgrades and removals in one pass, without changing the game state.
+
+        Each action is a tuple (action, unit_type, locations, num), where action is planner.SPAWN, 
+        planner.UPGRADE or planner.REMOVE. unit_type is ignored by upgrades and removals, and num is optional. 
+        Committing the plan gives the same stacks, resources and map as calling attempt_spawn, attempt_upgrade 
+        and attempt_remove in the same order, e.g. plan([(SPAWN, TURRET, turrets), (UPGRADE, None, turrets)]).commit()
+
+        Args:
+            actions: The actions, in priority order
+
+        Returns:
+            A Plan. Its results, build_stack, deploy_stack and resources can be inspected before calling commit()
+
+        """
+        return Plan(self, actions)
+
     def get_target_edge(self, start_location):
         """Gets the target edge given a starting location
 
@@ -485,7 +605,8 @@ class GameState:
 
         Returns:
             A list of locations corresponding to the path the unit would take 
-            to get from it's starting location to the best available end location
+            to get from it's starting location to the best available end location. 
+            Paths are cached by board, start and edge, see path_cache, and each call returns a new list
 
         """
         if self.contains_stationary_unit(start_location):
@@ -495,8 +616,70 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
+        key = PathCache.key(self.game_map, start_location, target_edge)
+        if key is not None:
+            path = self.path_cache.get(key, self.game_map, start_location)
+            if path is not None:
+                return path
         end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        if key is not None:
+            self.path_cache.put(key, self.game_map, path)
+        return path
+
+    def find_paths_to_edge(self, start_locations, target_edge=None):
+        """Gets the paths units at many locations would take, like calling find_path_to_edge for each of them.
+        The board is only searched once for each target edge and pocket of pathable space, 
+        so this is much faster than separate calls when there are many starts. Paths are cached like find_path_to_edge caches them.
+
+        Args:
+            start_locations: The locations of hypothetical units
+            target_edge: The edge the units want to reach. Induced from each start location if None.
+
+        Returns:
+            A list with the path of each start location, None for blocked locations
+
+        """
+        paths = [None] * len(start_locations)
+        keys = [None] * len(start_locations)
+        by_edge = {}
+        for position, start_location in enumerate(start_locations):
+            if self.contains_stationary_unit(start_location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            key = keys[position] = PathCache.key(self.game_map, start_location, edge)
+            if key is not None:
+                paths[position] = self.path_cache.get(key, self.game_map, start_location)
+            if paths[position] is None:
+                by_edge.setdefault(edge, []).append(position)
+
+        for edge, positions in by_edge.items():
+            end_points = self.game_map.get_edge_locations(edge)
+            found = self._shortest_path_finder.navigate_from_starts([start_locations[position] for position in positions], end_points, self)
+            for position, path in zip(positions, found):
+                paths[position] = path
+                if keys[position] is not None:
+                    self.path_cache.put(keys[position], self.game_map, path)
+        return paths
+
+    def path_field(self, start_location, target_edge=None):
+        """Gets a DynamicPathField for trying out structures one location at a time, 
+        e.g. field.block([12, 10]); field.path(); field.unblock([12, 10]). 
+        Each edit only repairs the distances it changes, instead of searching the whole board again.
+        The field starts from the current game_map, and editing it does not change the game_map.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            target_edge: The edge the unit wants to reach. Induced from start_location if None.
+
+        Returns:
+            A DynamicPathField whose path() is what find_path_to_edge would return on the edited board
+
+        """
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+        return DynamicPathField(start_location, self.game_map.get_edge_locations(target_edge), self.game_map.blocked_bits)
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -508,7 +691,7 @@ class GameState:
             A structures unit if there is a stationary unit at the location, False otherwise
             
         """
-        if not self.game_map.in_arena_bounds(location):
+        if not geometry.in_bounds(location):
             self.warn('Checked for stationary unit outside of arena bounds')
             return False
         x, y = map(int, location)
@@ -533,7 +716,8 @@ class GameState:
         """
 
         self.enable_warnings = not suppress
-        self.game_map.enable_warnings = not suppress
+        if self._game_map is not None:
+            self._game_map.enable_warnings = not suppress
 
     def get_target(self, attacking_unit):
         """Returns target of given unit based on current map of the game board. 
@@ -555,7 +739,7 @@ class GameState:
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.attackRange)
+        possible_cells = self.game_map.get_cells_in_range(attacker_location, attacking_unit.attackRange)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -563,14 +747,25 @@ class GameState:
         target_y = self.ARENA_SIZE
         target_x_distance = 0
 
-        for location in possible_locations:
+        if geometry.in_bounds(attacker_location):
+            distances = geometry.DISTANCE[geometry.INDEX_GRID[attacking_unit.x][attacking_unit.y]]
+        else:
+            distances = {index: self.game_map.distance_between_locations(geometry.CELLS[index], attacker_location) for index in possible_cells}
+
+        is_structure = self.rules.is_structure
+        attacker_player = attacking_unit.player_index
+        ignores_structures = attacking_unit.damage_f == 0
+        ignores_walkers = attacking_unit.damage_i == 0
+        for index in possible_cells:
+            location = geometry.CELLS[index]
             for unit in self.game_map[location]:
-                if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and is_stationary(unit.unit_type)) or (attacking_unit.damage_i == 0 and not(is_stationary(unit.unit_type))):
+                structure = is_structure[unit.type_id]
+                if unit.player_index == attacker_player or (ignores_structures and structure) or (ignores_walkers and not structure):
                     continue
 
                 new_target = False
                 unit_stationary = unit.stationary
-                unit_distance = self.game_map.distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
+                unit_distance = distances[index]
                 unit_health = unit.health
                 unit_y = unit.y
                 unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
@@ -635,13 +830,14 @@ class GameState:
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
-        for location_unit in possible_locations:
-            for unit in self.game_map[location_unit]:
-                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
+        possible_cells = self.game_map.get_cells_in_range(location, self.rules.max_attack_range)
+        index = geometry.CELL_INDEX.get((location[0], location[1]))
+        if index is not None:
+            distances = geometry.DISTANCE[index]
+        else:
+            distances = {index: self.game_map.distance_between_locations(location, geometry.CELLS[index]) for index in possible_cells}
+        for index in possible_cells:
+            for unit in self.game_map[geometry.CELLS[index]]:
+                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and distances[index] <= unit.attackRange:
                     attackers.append(unit)
         return attackers
@@ -0,0 +1,238 @@
+"""
+Static facts about the diamond shaped game board.
+The board never changes shape, so everything here is computed once when gamelib is imported
+and shared by GameMap, GameState and ShortestPathFinder.
+
+Attributes :
+    * ARENA_SIZE (int): The size of the arena
+    * HALF_ARENA (int): Half the size of the arena
+    * TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT (int): The edge constants, matching those on GameMap
+    * VALID (tuple): VALID[x][y] is True if [x, y] is on the board, for 0 <= x, y < ARENA_SIZE
+    * CELLS (tuple): The (x, y) of every location on the board, bottom row first and left to right within a row
+    * NUM_CELLS (int): The number of locations on the board (420)
+    * CELL_INDEX (dict): Maps an (x, y) tuple to its position in CELLS
+    * INDEX_GRID (tuple): INDEX_GRID[x][y] is the position of [x, y] in CELLS, or -1 if it is off the board
+    * NEIGHBORS (tuple): NEIGHBORS[x][y] is a tuple of the (x, y) locations next to [x, y] that are on the board,
+      ordered up, down, right, left like ShortestPathFinder._get_neighbors
+    * NEIGHBOR_INDICES (tuple): The same as NEIGHBORS, but indexed by and containing cell indices
+    * EDGES (tuple): Four tuples of (x, y) locations, indexed by the edge constants
+    * EDGE_SETS (tuple): The same as EDGES, as frozensets for membership checks
+    * SPAWN_EDGE_SET (frozenset): The locations of the two bottom edges, where you can deploy mobile units
+    * CELL_XY (ndarray): The (x, y) of every cell as an array of shape (NUM_CELLS, 2)
+    * SQUARED_DISTANCE (ndarray): SQUARED_DISTANCE[a, b] is the squared euclidean distance between cells a and b
+    * DISTANCE (ndarray): DISTANCE[a, b] is the euclidean distance between cells a and b
+    * CELL_BITS (tuple): CELL_BITS[index] is 1 << index, the bit for a cell in a bitboard over the cell indices
+    * ALL_BITS (int): A bitboard with every cell set
+    * HALF_BITS (tuple): Bitboards of the two halves of the board, [0] is the bottom (your) half and [1] the top half
+    * EDGE_BITS (tuple): Bitboards of the four edges, indexed by the edge constants
+    * NEIGHBOR_BITS (tuple): NEIGHBOR_BITS[index] is a bitboard of the cells next to a cell
+    * ZOBRIST_BLOCKED (tuple): A random 64 bit key per cell, XORed together to hash a set of blocked cells
+    * RANGE_CACHE_SIZE (int): How many (center, radius, hit radius) results cells_in_range keeps before evicting the least recently used
+
+"""
+import functools
+import math
+import random
+import numpy as np
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+
+def _in_diamond(x, y):
+    row_size = y + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    top_half_check = (y < HALF_ARENA and x >= startx and x <= endx)
+
+    row_size = (ARENA_SIZE - 1 - y) + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    bottom_half_check = (y >= HALF_ARENA and x >= startx and x <= endx)
+
+    return bottom_half_check or top_half_check
+
+
+VALID = tuple(tuple(_in_diamond(x, y) for y in range(ARENA_SIZE)) for x in range(ARENA_SIZE))
+
+CELLS = tuple((x, y) for y in range(ARENA_SIZE) for x in range(ARENA_SIZE) if VALID[x][y])
+NUM_CELLS = len(CELLS)
+CELL_INDEX = {cell: index for index, cell in enumerate(CELLS)}
+INDEX_GRID = tuple(tuple(CELL_INDEX.get((x, y), -1) for y in range(ARENA_SIZE)) for x in range(ARENA_SIZE))
+
+_CELL_SET = frozenset(CELLS)
+
+
+def in_bounds(location):
+    """Checks if the given location is inside the diamond shaped game board.
+
+    Args:
+        location: A map location, [x, y] or (x, y)
+
+    Returns:
+        True if the location is on the board, False otherwise
+
+    """
+    x, y = location
+    return (x, y) in _CELL_SET
+
+
+def _neighbors(x, y):
+    return tuple(n for n in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)) if n in _CELL_SET)
+
+
+NEIGHBORS = tuple(tuple(_neighbors(x, y) for y in range(ARENA_SIZE)) for x in range(ARENA_SIZE))
+NEIGHBOR_INDICES = tuple(tuple(CELL_INDEX[n] for n in NEIGHBORS[x][y]) for x, y in CELLS)
+
+
+def _edges():
+    top_right = tuple((HALF_ARENA + num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    top_left = tuple((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    bottom_left = tuple((HALF_ARENA - 1 - num, num) for num in range(HALF_ARENA))
+    bottom_right = tuple((HALF_ARENA + num, num) for num in range(HALF_ARENA))
+    return (top_right, top_left, bottom_left, bottom_right)
+
+
+EDGES = _edges()
+EDGE_SETS = tuple(frozenset(edge) for edge in EDGES)
+SPAWN_EDGE_SET = EDGE_SETS[BOTTOM_LEFT] | EDGE_SETS[BOTTOM_RIGHT]
+
+
+CELL_XY = np.array(CELLS, dtype=np.int32)
+SQUARED_DISTANCE = ((CELL_XY[:, None, 0] - CELL_XY[None, :, 0]) ** 2 +
+                    (CELL_XY[:, None, 1] - CELL_XY[None, :, 1]) ** 2)
+DISTANCE = np.sqrt(SQUARED_DISTANCE)
+for _table in (CELL_XY, SQUARED_DISTANCE, DISTANCE):
+    _table.flags.writeable = False
+
+
+CELL_BITS = tuple(1 << index for index in range(NUM_CELLS))
+ALL_BITS = (1 << NUM_CELLS) - 1
+HALF_BITS = (sum(CELL_BITS[index] for index, (x, y) in enumerate(CELLS) if y < HALF_ARENA),
+             sum(CELL_BITS[index] for index, (x, y) in enumerate(CELLS) if y >= HALF_ARENA))
+EDGE_BITS = tuple(sum(CELL_BITS[CELL_INDEX[cell]] for cell in edge) for edge in EDGES)
+NEIGHBOR_BITS = tuple(sum(CELL_BITS[n] for n in neighbors) for neighbors in NEIGHBOR_INDICES)
+
+
+def iter_bits(bits):
+    """Iterates over the cells set in a bitboard
+
+    Args:
+        bits: A bitboard over the cell indices
+
+    Yields:
+        Cell indices in increasing order
+
+    """
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def bits_to_locations(bits):
+    """Converts a bitboard to a list of [x, y] locations, in map iteration order
+    """
+    return [[CELLS[index][0], CELLS[index][1]] for index in iter_bits(bits)]
+
+
+def locations_to_bits(locations):
+    """Converts a list of [x, y] locations to a bitboard, ignoring locations outside the arena
+    """
+    bits = 0
+    for x, y in locations:
+        index = CELL_INDEX.get((x, y))
+        if index is not None:
+            bits |= CELL_BITS[index]
+    return bits
+
+
+def adjacent_bits(bits):
+    """Gets the cells next to any cell in a bitboard
+
+    Args:
+        bits: A bitboard over the cell indices
+
+    Returns:
+        A bitboard of every cell next to a cell in bits. It can overlap bits.
+
+    """
+    adjacent = 0
+    for index in iter_bits(bits):
+        adjacent |= NEIGHBOR_BITS[index]
+    return adjacent
+
+
+_ZOBRIST_TYPES = 16
+_zobrist_random = random.Random(20190816)
+ZOBRIST_BLOCKED = tuple(_zobrist_random.getrandbits(64) | 1 for _ in range(NUM_CELLS))
+_ZOBRIST_STRUCTURES = tuple(_zobrist_random.getrandbits(64) | 1 for _ in range(NUM_CELLS * _ZOBRIST_TYPES * 3 * 2))
+
+
+def zobrist_structure_key(index, type_index, player_index, upgraded):
+    """Gets the random 64 bit key for a structure, XORed together to hash a structure layout
+
+    Args:
+        index: The cell index of the structure
+        type_index: The index of the structure type in the config's unitInformation
+        player_index: The player controlling the structure, 0, 1 or None
+        upgraded: If the structure is upgraded
+
+    Returns:
+        A non-zero 64 bit integer
+
+    """
+    owner = 2 if player_index is None else player_index
+    return _ZOBRIST_STRUCTURES[((index * _ZOBRIST_TYPES + type_index % _ZOBRIST_TYPES) * 3 + owner) * 2 + bool(upgraded)]
+
+
+RANGE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=64)
+def range_stencil(radius, hit_radius):
+    """Gets the offsets of the locations that a unit with the given range affects
+
+    A unit with a given range affects all locations whose centers are within that range + get hit radius.
+
+    Args:
+        radius: The range of the unit
+        hit_radius: The getHitRadius from the game config
+
+    Returns:
+        A tuple of (dx, dy) offsets, ordered by dx then dy
+
+    """
+    search_radius = math.ceil(radius)
+    reach = radius + hit_radius
+    return tuple((dx, dy)
+                 for dx in range(-search_radius, search_radius + 1)
+                 for dy in range(-search_radius, search_radius + 1)
+                 if math.sqrt(dx ** 2 + dy ** 2) < reach)
+
+
+@functools.lru_cache(maxsize=RANGE_CACHE_SIZE)
+def cells_in_range(index, radius, hit_radius):
+    """Gets the cells that a unit on the given cell with the given range affects
+
+    Args:
+        index: The cell index of the center, see CELL_INDEX
+        radius: The range of the unit
+        hit_radius: The getHitRadius from the game config
+
+    Returns:
+        A tuple of cell indices, ordered by x then y
+
+    """
+    x, y = CELLS[index]
+    cells = []
+    for dx, dy in range_stencil(radius, hit_radius):
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and VALID[nx][ny]:
+            cells.append(INDEX_GRID[nx][ny])
+    return tuple(cells)
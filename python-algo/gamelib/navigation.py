@@ -2,6 +2,8 @@ import heapq
 import math
 import sys
 import queue
+from collections import OrderedDict
+from . import geometry
 from .util import debug_write
 
 class Node:
@@ -71,9 +73,9 @@ class ShortestPathFinder:
         #Initialize map 
         self.initialize_map(game_state)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        for index in geometry.iter_bits(self.game_state.game_map.blocked_bits):
+            x, y = geometry.CELLS[index]
+            self.game_map[x][y].blocked = True
         #Do pathfinding
         ideal_endpoints = self._idealness_search(start_point, end_points)
         self._validate(ideal_endpoints, end_points)
@@ -93,7 +95,7 @@ class ShortestPathFinder:
         while not current.empty():
             search_location = current.get()
             for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if self.game_map[neighbor[0]][neighbor[1]].blocked:
                     continue
 
                 x, y = neighbor
@@ -110,10 +112,10 @@ class ShortestPathFinder:
         return most_ideal
 
     def _get_neighbors(self, location):
-        """Get the locations adjacent to a location
+        """Get the locations adjacent to a location that are inside the arena
         """
         x, y = location
-        return [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
+        return [[nx, ny] for nx, ny in geometry.NEIGHBORS[x][y]]
 
     def _get_direction_from_endpoints(self, end_points):
         """Prints a message to the games debug output
@@ -181,7 +183,7 @@ class ShortestPathFinder:
             current_location = current.get()
             current_node = self.game_map[current_location[0]][current_location[1]]
             for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if self.game_map[neighbor[0]][neighbor[1]].blocked:
                     continue
 
                 neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
@@ -228,7 +230,7 @@ class ShortestPathFinder:
         best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
         for neighbor in neighbors:
             #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            if self.game_map[neighbor[0]][neighbor[1]].blocked:
                 continue
 
             new_best = False
@@ -314,3 +316,522 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+PATH_CACHE_SIZE = 4096
+
+
+class PathCache:
+    """Remembers paths by board, start and target edge, evicting the least recently used
+
+    Paths are keyed by the map's blocking_hash, so an entry is simply never found again once a structure edit
+    changes which locations are blocked, and boards that block the same locations share entries, 
+    whichever turn or fork they come from. The blocked locations are stored with each path and checked on a hit, 
+    so hash collisions cannot return a wrong path.
+
+    Attributes :
+        * maxsize (int): How many paths are kept
+        * hits (int): How many lookups found a path
+        * misses (int): How many lookups did not
+
+    """
+
+    def __init__(self, maxsize=PATH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._paths = OrderedDict()
+
+    def __len__(self):
+        return len(self._paths)
+
+    @staticmethod
+    def key(game_map, start_location, target_edge):
+        """The cache key of a path, None if start_location is not on the board
+        """
+        start = geometry.CELL_INDEX.get((start_location[0], start_location[1]))
+        if start is None:
+            return None
+        # A start given as a tuple can path differently, see FlatPathFinder.navigate_from_starts
+        return (game_map.blocking_hash, start, target_edge, type(start_location) is list)
+
+    def get(self, key, game_map, start_location):
+        """Gets a copy of a cached path, with start_location as its first entry like the path finder returns it. None on a miss.
+        """
+        entry = self._paths.get(key)
+        if entry is None or entry[0] != game_map.blocked_bits:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._paths.move_to_end(key)
+        path = [start_location]
+        path.extend([x, y] for x, y in entry[1])
+        return path
+
+    def put(self, key, game_map, path):
+        """Stores a path found on game_map under key
+        """
+        self._paths[key] = (game_map.blocked_bits, tuple((x, y) for x, y in path[1:]))
+        self._paths.move_to_end(key)
+        if len(self._paths) > self.maxsize:
+            self._paths.popitem(last=False)
+
+    def clear(self):
+        """Forgets every path and resets the counters
+        """
+        self._paths.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+_NO_PATHLENGTH = [-1] * geometry.NUM_CELLS
+_UNBLOCKED = bytes(geometry.NUM_CELLS)
+
+
+def _idealness_table(direction):
+    """The idealness ShortestPathFinder._get_idealness gives every cell that is not an endpoint, for an edge direction
+    """
+    table = []
+    for x, y in geometry.CELLS:
+        idealness = 28 * y if direction[1] == 1 else 28 * (27 - y)
+        idealness += x if direction[0] == 1 else 27 - x
+        table.append(idealness)
+    return tuple(table)
+
+
+_IDEALNESS = {(dx, dy): _idealness_table((dx, dy)) for dx in (1, -1) for dy in (1, -1)}
+
+
+_HORIZONTAL = 1
+_VERTICAL = 2
+
+
+def walk_path(start_point, start, pathlength, blocked, direction):
+    """Walks from the start to a cell with pathlength 0, making the moves ShortestPathFinder._choose_next_move would
+
+    Args:
+        * start_point: The starting location, the first entry of the path
+        * start: The cell index of the start
+        * pathlength: The distance field, indexed by cell
+        * blocked: Truthy for the blocked cells, indexed by cell
+        * direction: The direction of the target edge, (1, 1) for the top right and (-1, 1) for the top left
+
+    Returns:
+        The path, start_point followed by the [x, y] locations it moves through
+
+    """
+    neighbor_indices = geometry.NEIGHBOR_INDICES
+    cells = geometry.CELLS
+    dx, dy = direction
+    path = [start_point]
+    current = start
+    move_direction = 0
+    while pathlength[current] != 0:
+        cx, cy = cells[current]
+        ideal = current
+        bx, by = cx, cy
+        best_pathlength = pathlength[current]
+        for neighbor in neighbor_indices[current]:
+            if blocked[neighbor]:
+                continue
+            current_pathlength = pathlength[neighbor]
+            if current_pathlength > best_pathlength:
+                continue
+            nx, ny = cells[neighbor]
+            if current_pathlength == best_pathlength:
+                # ShortestPathFinder._better_direction
+                if move_direction == _HORIZONTAL and nx != bx:
+                    better = cy != ny
+                elif move_direction == _VERTICAL and ny != by:
+                    better = cx != nx
+                elif move_direction == 0:
+                    better = cy != ny
+                elif ny == by:
+                    better = (dx == 1 and nx > bx) or (dx == -1 and nx < bx)
+                elif nx == bx:
+                    better = (dy == 1 and ny > by) or (dy == -1 and ny < by)
+                else:
+                    better = True
+                if not better:
+                    continue
+            ideal = neighbor
+            bx, by = nx, ny
+            best_pathlength = current_pathlength
+
+        move_direction = _VERTICAL if cx == bx else _HORIZONTAL
+        path.append([bx, by])
+        current = ideal
+    return path
+
+
+class FlatPathFinder:
+    """Finds the same paths as ShortestPathFinder, keeping the search state in flat arrays indexed by cell
+
+    Locations are handled as cell indices (see geometry), using the precomputed neighbour tables.
+    The blocked cells, the pockets of pathable space and the distance fields are only rebuilt when the map's blocked_bits change, 
+    so paths from many starts to the same edge share one field, see navigate_from_starts. 
+    navigate_multiple_endpoints returns exactly what ShortestPathFinder.navigate_multiple_endpoints would, 
+    including its choice between equally short moves.
+
+    Attributes :
+        * HORIZONTAL (int): A constant representing a horizontal movement
+        * VERTICAL (int): A constant representing a vertical movement
+        * blocked (bytearray): blocked[index] is 1 if a structure is at the cell, for the most recent search
+        * pathlength (list): pathlength[index] is the distance from the cell to the target, -1 if unreachable, for the most recent path
+
+    """
+    HORIZONTAL = 1
+    VERTICAL = 2
+
+    def __init__(self):
+        self.blocked = bytearray(geometry.NUM_CELLS)
+        self.pathlength = _NO_PATHLENGTH
+        self._blocked_bits = 0
+        self._targets = {}
+        self._clear_board()
+
+    def _clear_board(self):
+        # Everything below only depends on the blocked cells
+        self._component = [-1] * geometry.NUM_CELLS
+        self._members = []
+        self._seeds = {}
+        self._fields = {}
+
+    def load_blocked(self, blocked_bits):
+        """Sets the blocked cells from a bitboard, such as GameMap.blocked_bits
+        """
+        if blocked_bits == self._blocked_bits:
+            return
+        blocked = self.blocked
+        blocked[:] = _UNBLOCKED
+        for index in geometry.iter_bits(blocked_bits):
+            blocked[index] = 1
+        self._blocked_bits = blocked_bits
+        self._clear_board()
+
+    def navigate_multiple_endpoints(self, start_point, end_points, game_state):
+        """Finds the path a unit would take to reach a set of endpoints, see ShortestPathFinder.navigate_multiple_endpoints
+        """
+        return self.navigate_from_starts([start_point], end_points, game_state)[0]
+
+    def navigate_from_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at many locations would take to reach the same endpoints
+
+        The distance field to the endpoints is built once for each pocket of pathable space the starts are in,
+        so each further start only costs walking its path.
+
+        Args:
+            * start_points: The starting locations of the units
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list with the path of each start, as navigate_multiple_endpoints would return it. None for blocked starts.
+
+        """
+        targets = self._target_cells(end_points)
+        if targets is None:
+            # Off the board, leave the warnings and results to the reference implementation
+            return [ShortestPathFinder().navigate_multiple_endpoints(start_point, end_points, game_state) for start_point in start_points]
+        self.load_blocked(game_state.game_map.blocked_bits)
+        direction = self._direction(end_points)
+        paths = []
+        for start_point in start_points:
+            start = geometry.CELL_INDEX.get((start_point[0], start_point[1]))
+            if start is None:
+                paths.append(ShortestPathFinder().navigate_multiple_endpoints(start_point, end_points, game_state))
+                continue
+            if self.blocked[start]:
+                paths.append(None)
+                continue
+            start_ideal = start_point in end_points
+            if targets[0][start] and not start_ideal:
+                # The search revisits the start as an [x, y] list, which would make a tuple start more ideal than itself
+                paths.append(ShortestPathFinder().navigate_multiple_endpoints(start_point, end_points, game_state))
+                continue
+            self.pathlength = self.distance_field(start, targets, direction, start_ideal)
+            paths.append(self._get_path(start_point, start, direction))
+        return paths
+
+    def distance_field(self, start, targets, direction, start_ideal=False):
+        """Gets the pathlength of every cell, as ShortestPathFinder._validate sets it for a unit at start.
+        Fields are shared by every start in the same pocket and kept until the blocked cells change, so they must not be modified.
+
+        Args:
+            * start: The cell index of an unblocked start
+            * targets: The endpoint flags and seeds, from _target_cells
+            * direction: The direction of the edge, from _direction
+            * start_ideal: True if the start is one of the endpoints as given
+
+        Returns:
+            A list of pathlengths indexed by cell, -1 where the target cannot be reached
+
+        """
+        seeds = self._pocket_seeds(start, targets, direction)
+        if start_ideal:
+            seeds = targets[1]
+        field = self._fields.get(seeds)
+        if field is None:
+            field = self._fields[seeds] = self._validate(seeds)
+        return field
+
+    def _target_cells(self, end_points):
+        """
+        Gets which cells count as endpoints, as flags by cell index, and the cells the endpoints seed, in order.
+        Like ShortestPathFinder, a searched cell only matches an endpoint given as an [x, y] list.
+        None if an endpoint is off the board.
+        """
+        key = tuple((type(point) is list, point[0], point[1]) for point in end_points)
+        targets = self._targets.get(key)
+        if targets is None:
+            flags = bytearray(geometry.NUM_CELLS)
+            seeds = []
+            for is_list, x, y in key:
+                index = geometry.CELL_INDEX.get((x, y))
+                if index is None:
+                    return None
+                if is_list:
+                    flags[index] = 1
+                seeds.append(index)
+            targets = self._targets[key] = (bytes(flags), tuple(seeds))
+        return targets
+
+    def _direction(self, end_points):
+        x, y = end_points[0]
+        return (-1 if x < geometry.HALF_ARENA else 1, -1 if y < geometry.HALF_ARENA else 1)
+
+    def _pocket(self, start):
+        """The id of the connected pathable space holding an unblocked start, labelling it the first time it is seen
+        """
+        component = self._component
+        pocket = component[start]
+        if pocket >= 0:
+            return pocket
+        blocked = self.blocked
+        neighbor_indices = geometry.NEIGHBOR_INDICES
+        pocket = len(self._members)
+        component[start] = pocket
+        queue = [start]
+        for cell in queue:
+            for neighbor in neighbor_indices[cell]:
+                if component[neighbor] < 0 and not blocked[neighbor]:
+                    component[neighbor] = pocket
+                    queue.append(neighbor)
+        self._members.append(queue)
+        return pocket
+
+    def _pocket_seeds(self, start, targets, direction):
+        """
+        The cells _validate starts from for a unit at start, like ShortestPathFinder._idealness_search picks them:
+        every endpoint if one is in the start's pocket, otherwise the pocket's most ideal cell.
+        Cells that are not endpoints never tie on idealness, so the choice does not depend on where in the pocket the unit starts.
+        """
+        pocket = self._pocket(start)
+        key = (pocket, targets, direction)
+        seeds = self._seeds.get(key)
+        if seeds is None:
+            flags, endpoint_seeds = targets
+            members = self._members[pocket]
+            if any(flags[cell] for cell in members):
+                seeds = endpoint_seeds
+            else:
+                seeds = (max(members, key=_IDEALNESS[direction].__getitem__),)
+            self._seeds[key] = seeds
+        return seeds
+
+    def _validate(self, seeds):
+        """Breadth first search from the seed cells, returning the pathlength of every cell
+        """
+        blocked = self.blocked
+        pathlength = list(_NO_PATHLENGTH)
+        neighbor_indices = geometry.NEIGHBOR_INDICES
+        for seed in seeds:
+            pathlength[seed] = 0
+        queue = list(seeds)
+        for cell in queue:
+            # Blocked endpoints are seeded, but nothing is reached through them
+            if blocked[cell]:
+                continue
+            next_length = pathlength[cell] + 1
+            for neighbor in neighbor_indices[cell]:
+                if not blocked[neighbor] and pathlength[neighbor] < 0:
+                    pathlength[neighbor] = next_length
+                    queue.append(neighbor)
+        return pathlength
+
+    def _get_path(self, start_point, start, direction):
+        """Walks from the start to a cell with pathlength 0, see walk_path
+        """
+        return walk_path(start_point, start, self.pathlength, self.blocked, direction)
+
+
+class DynamicPathField(FlatPathFinder):
+    """The distance field and path of one start, kept up to date while single locations are blocked and unblocked
+
+    This is meant for what-if loops, such as trying dozens of candidate walls one at a time.
+    Blocking or unblocking a location only repairs the part of the field whose distances change. 
+    The start's pocket of pathable space and its most ideal cell are only searched again 
+    when the edit changes which cells the start can reach. Edits are hypothetical, the GameMap is not changed.
+    path() always returns what ShortestPathFinder.navigate_multiple_endpoints would return on the edited board.
+
+    Attributes :
+        * start_point (list): The [x, y] start of the unit
+        * end_points (list): The locations the unit is trying to reach, an edge
+        * repairs (int): How many edits were handled by repairing the field
+        * rebuilds (int): How many times the field was built from scratch, including the first time
+
+    """
+
+    def __init__(self, start_point, end_points, blocked_bits=0):
+        super().__init__()
+        self.start_point = [start_point[0], start_point[1]]
+        self.end_points = end_points
+        self._start = geometry.CELL_INDEX.get((start_point[0], start_point[1]))
+        self._target = self._target_cells(end_points)
+        if self._start is None or self._target is None:
+            raise ValueError("DynamicPathField needs a start and end points on the board")
+        self._direction_to_edge = self._direction(end_points)
+        self.repairs = 0
+        self.rebuilds = 0
+        self.load_blocked(blocked_bits)
+        self._rebuild()
+
+    @property
+    def blocked_bits(self):
+        """A bitboard of the blocked cells, including the edits
+        """
+        return self._blocked_bits
+
+    def path(self):
+        """The path the unit would take on the edited board, None if its start is blocked
+        """
+        if self.blocked[self._start]:
+            return None
+        return self._get_path(self.start_point, self._start, self._direction_to_edge)
+
+    def block(self, location):
+        """Places a hypothetical structure at a location
+        """
+        index = geometry.CELL_INDEX[(location[0], location[1])]
+        if self.blocked[index]:
+            return
+        self.blocked[index] = 1
+        self._blocked_bits |= geometry.CELL_BITS[index]
+        if index == self._start:
+            self._rebuild()
+            return
+        self._raise(index)
+        self.repairs += 1
+        if self.pathlength[self._start] < 0:
+            # The start was cut off from its target, so its pocket now has another most ideal cell
+            self._rebuild()
+
+    def unblock(self, location):
+        """Removes a structure, real or hypothetical, from a location
+        """
+        index = geometry.CELL_INDEX[(location[0], location[1])]
+        if not self.blocked[index]:
+            return
+        self.blocked[index] = 0
+        self._blocked_bits &= ~geometry.CELL_BITS[index]
+        pathlength = self.pathlength
+        if index == self._start or (not self._to_edge and any(
+                not self.blocked[neighbor] and pathlength[neighbor] >= 0 for neighbor in geometry.NEIGHBOR_INDICES[index])):
+            # The start's pocket grows, and may now hold a more ideal cell or an endpoint
+            self._rebuild()
+            return
+        self._lower(index)
+        self.repairs += 1
+
+    def _rebuild(self):
+        self._clear_board()
+        self.rebuilds += 1
+        self._is_seed = bytearray(geometry.NUM_CELLS)
+        if self.blocked[self._start]:
+            self.pathlength = list(_NO_PATHLENGTH)
+            self._to_edge = False
+            return
+        flags, endpoint_seeds = self._target
+        if self.start_point in self.end_points:
+            seeds = endpoint_seeds
+        else:
+            seeds = self._pocket_seeds(self._start, self._target, self._direction_to_edge)
+        # Either every endpoint is seeded, or the single most ideal cell of the start's pocket
+        self._to_edge = seeds is endpoint_seeds
+        for seed in seeds:
+            self._is_seed[seed] = 1
+        self.pathlength = self._validate(seeds)
+
+    def _raise(self, index):
+        """Repairs the field after index was blocked. Only cells whose every shortest route went through it change.
+        """
+        blocked = self.blocked
+        is_seed = self._is_seed
+        pathlength = self.pathlength
+        neighbor_indices = geometry.NEIGHBOR_INDICES
+        old_length = pathlength[index]
+        if old_length < 0:
+            return
+        if not is_seed[index]:
+            pathlength[index] = -1
+
+        # Find the cells left without a neighbor one step closer, a level of distance at a time
+        affected = []
+        marked = bytearray(geometry.NUM_CELLS)
+        level = [neighbor for neighbor in neighbor_indices[index]
+                 if not blocked[neighbor] and not is_seed[neighbor] and pathlength[neighbor] == old_length + 1]
+        while level:
+            next_level = []
+            for cell in level:
+                if marked[cell]:
+                    continue
+                closer = pathlength[cell] - 1
+                if any(not blocked[neighbor] and not marked[neighbor] and pathlength[neighbor] == closer
+                       for neighbor in neighbor_indices[cell]):
+                    continue
+                marked[cell] = 1
+                affected.append(cell)
+                farther = pathlength[cell] + 1
+                next_level.extend(neighbor for neighbor in neighbor_indices[cell]
+                                  if not blocked[neighbor] and not is_seed[neighbor] and pathlength[neighbor] == farther)
+            level = next_level
+
+        # Give them their new distances, from the cells around them that kept theirs
+        heap = []
+        for cell in affected:
+            lengths = [pathlength[neighbor] for neighbor in neighbor_indices[cell]
+                       if not blocked[neighbor] and not marked[neighbor] and pathlength[neighbor] >= 0]
+            if lengths:
+                heap.append((min(lengths) + 1, cell))
+        for cell in affected:
+            pathlength[cell] = -1
+        heapq.heapify(heap)
+        while heap:
+            length, cell = heapq.heappop(heap)
+            if not marked[cell]:
+                continue
+            marked[cell] = 0
+            pathlength[cell] = length
+            for neighbor in neighbor_indices[cell]:
+                if marked[neighbor]:
+                    heapq.heappush(heap, (length + 1, neighbor))
+
+    def _lower(self, index):
+        """Repairs the field after index was unblocked, spreading the shorter distances it opens up
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        neighbor_indices = geometry.NEIGHBOR_INDICES
+        if not self._is_seed[index]:
+            lengths = [pathlength[neighbor] for neighbor in neighbor_indices[index]
+                       if not blocked[neighbor] and pathlength[neighbor] >= 0]
+            if not lengths:
+                return
+            pathlength[index] = min(lengths) + 1
+        queue = [index]
+        for cell in queue:
+            next_length = pathlength[cell] + 1
+            for neighbor in neighbor_indices[cell]:
+                if not blocked[neighbor] and (pathlength[neighbor] < 0 or pathlength[neighbor] > next_length):
+                    pathlength[neighbor] = next_length
+                    queue.append(neighbor)
@@ -0,0 +1,180 @@
+"""
+Plans many spawns, upgrades and removals in one pass, see GameState.plan.
+
+A Plan gives the same build and deploy stacks, resources and map as calling attempt_spawn,
+attempt_upgrade and attempt_remove with the same arguments in the same order. Planning does not
+change the GameState, so a plan can be inspected and thrown away, or applied with commit().
+"""
+import math
+
+from . import geometry
+from .rules import SP, MP
+
+SPAWN = "spawn"
+UPGRADE = "upgrade"
+REMOVE = "remove"
+
+
+def _number_affordable(held, cost):
+    # Same arithmetic as GameState.number_affordable, so plans agree with it on every boundary
+    if cost[MP] > 0 and cost[SP] > 0:
+        return min(math.floor(held[SP] / cost[SP]), math.floor(held[MP] / cost[MP]))
+    elif cost[MP] > 0:
+        return math.floor(held[MP] / cost[MP])
+    elif cost[SP] > 0:
+        return math.floor(held[SP] / cost[SP])
+    return 0
+
+
+class Plan:
+    """The outcome of a list of actions, worked out without changing the GameState
+
+    Attributes :
+        * actions (list): The (action, unit_type, locations, num) tuples that were planned
+        * results (list): What each action's attempt_spawn, attempt_upgrade or attempt_remove call would return
+        * build_stack (list): The entries the plan adds to the build stack
+        * deploy_stack (list): The entries the plan adds to the deploy stack
+        * resources (list): Your [SP, MP] after the plan
+        * committed (bool): If commit() has been called
+
+    """
+
+    def __init__(self, game_state, actions):
+        self.game_state = game_state
+        self.actions = [tuple(action) for action in actions]
+        self.committed = False
+        self.__resolve()
+
+    def __resolve(self):
+        game_state = self.game_state
+        game_map = game_state.game_map
+        rules = game_state.rules
+        self._structure_hash = game_map.structure_hash
+        self._occupied = frozenset(game_map._occupied)
+        self._held = game_state.get_resources(0)
+        held = list(self._held)
+
+        # Structures and units added by earlier actions, on top of what the map already holds
+        planned_structures = {}
+        planned_units = set()
+        self.results = []
+        self.build_stack = []
+        self.deploy_stack = []
+        self._edits = []
+
+        def structure_at(x, y):
+            """The (type id, upgraded) of the structure at an in bounds location, or None"""
+            planned = planned_structures.get((x, y))
+            if planned is not None:
+                return planned
+            if game_map.blocked_bits & geometry.CELL_BITS[geometry.INDEX_GRID[x][y]]:
+                return (int(game_map.structure_type[x, y]), bool(game_map.structure_upgraded[x, y]))
+            return None
+
+        for action in self.actions:
+            kind, unit_type, locations = action[:3]
+            num = action[3] if len(action) > 3 else 1
+            if kind == SPAWN:
+                type_id = rules.type_ids.get(unit_type)
+                if type_id is None or not rules.spawnable[type_id]:
+                    game_state._invalid_unit(unit_type)
+                    self.results.append(None)
+                    continue
+                if num < 1 or not locations:
+                    game_state.warn("Attempted to spawn fewer than one units! ({})".format(num))
+                    self.results.append(None)
+                    continue
+                if type(locations[0]) == int:
+                    locations = [locations]
+                stationary = rules.is_structure[type_id]
+                cost = rules.costs[type_id]
+                stack = self.build_stack if stationary else self.deploy_stack
+                spawned = 0
+                for location in locations:
+                    if not geometry.in_bounds(location):
+                        continue
+                    x, y = int(location[0]), int(location[1])
+                    if y >= geometry.HALF_ARENA or not (stationary or (location[0], location[1]) in geometry.SPAWN_EDGE_SET):
+                        continue
+                    for _ in range(num):
+                        if _number_affordable(held, cost) < 1 or structure_at(x, y) is not None:
+                            break
+                        if stationary and ((x, y) in planned_units or geometry.INDEX_GRID[x][y] in game_map._occupied):
+                            break
+                        held[SP] = held[SP] + (0 - cost[SP])
+                        held[MP] = held[MP] + (0 - cost[MP])
+                        if stationary:
+                            planned_structures[(x, y)] = (type_id, False)
+                        planned_units.add((x, y))
+                        self._edits.append((SPAWN, unit_type, location))
+                        stack.append((unit_type, x, y))
+                        spawned += 1
+                self.results.append(spawned)
+            elif kind == UPGRADE:
+                if not locations:
+                    game_state.warn("Attempted to upgrade fewer than one units!")
+                    self.results.append(None)
+                    continue
+                if type(locations[0]) == int:
+                    locations = [locations]
+                upgraded = 0
+                for location in locations:
+                    if location[1] >= geometry.HALF_ARENA or not geometry.in_bounds(location):
+                        continue
+                    x, y = int(location[0]), int(location[1])
+                    structure = structure_at(x, y)
+                    if structure is None or structure[1] or not rules.upgradable[structure[0]]:
+                        continue
+                    cost = rules.upgrade_costs[structure[0]]
+                    if held[SP] >= cost[SP] and held[MP] >= cost[MP]:
+                        held[SP] = held[SP] + (0 - cost[SP])
+                        held[MP] = held[MP] + (0 - cost[MP])
+                        planned_structures[(x, y)] = (structure[0], True)
+                        self._edits.append((UPGRADE, None, (x, y)))
+                        self.build_stack.append((rules.UPGRADE, x, y))
+                        upgraded += 1
+                self.results.append(upgraded)
+            elif kind == REMOVE:
+                if locations and type(locations[0]) == int:
+                    locations = [locations]
+                removed = 0
+                for location in locations:
+                    if location[1] < geometry.HALF_ARENA and geometry.in_bounds(location) and structure_at(int(location[0]), int(location[1])) is not None:
+                        self.build_stack.append((rules.REMOVE, int(location[0]), int(location[1])))
+                        removed += 1
+                self.results.append(removed)
+            else:
+                game_state.warn("Unknown action {} in plan, expected spawn, upgrade or remove".format(kind))
+                self.results.append(None)
+        self.resources = held
+
+    def commit(self):
+        """Applies the plan to the GameState it was made for, like the equivalent attempt_* calls would.
+        If the state changed since the plan was made, the actions are planned again first.
+
+        Returns:
+            The results of the actions
+
+        """
+        if self.committed:
+            self.game_state.warn("This plan has already been committed.")
+            return self.results
+        game_state = self.game_state
+        game_map = game_state.game_map
+        if (game_map.structure_hash != self._structure_hash or game_map._occupied != self._occupied
+                or game_state.get_resources(0) != self._held):
+            self.__resolve()
+
+        for kind, unit_type, location in self._edits:
+            x, y = int(location[0]), int(location[1])
+            if kind == SPAWN:
+                game_map.add_unit(unit_type, location, 0)
+            else:
+                game_map._upgrade_structure(x, y)
+        game_state._build_stack.extend(self.build_stack)
+        game_state._deploy_stack.extend(self.deploy_stack)
+        resources = game_state._player_resources[0]
+        resources['SP'] = self.resources[SP]
+        resources['MP'] = self.resources[MP]
+        self.committed = True
+        return self.results
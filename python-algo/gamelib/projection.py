@@ -0,0 +1,99 @@
+"""
+Projections of the resources players will hold on future turns.
+
+The income of every turn only depends on the config, so ResourceProjection builds the income schedule
+once per game (RuleSet.projection) and projects whole arrays of starting amounts at once.
+The results match GameState.project_future_MP, including its rounding to one decimal each turn.
+"""
+import numpy as np
+
+
+def _round_tenths(values):
+    """Rounds every value to one decimal exactly like the builtin round(value, 1)
+    """
+    scaled = values * 10
+    rounded = np.rint(scaled) / 10
+    # rint(value * 10) can land on the wrong side of a tie, which round() settles on the exact value
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(value, 1) for value in values[near_tie].tolist()]
+    return rounded
+
+
+class ResourceProjection:
+    """The MP and SP schedule of a game
+
+    Both players follow the same schedule, so one table serves both. MP decays by bit_decay_per_round
+    before each turn's income is added, SP does not decay. Neither projection includes resources
+    gained from damaging the opponent, which cannot be predicted.
+
+    Attributes :
+        * MP_income (ndarray): MP_income[t] is the MP a player gains at the start of turn t
+        * SP_income (ndarray): SP_income[t] is the SP a player gains at the start of turn t
+        * MP_decay (float): The fraction of MP kept from one turn to the next
+        * SP_per_round (float): The SP a player gains every turn
+
+    """
+
+    def __init__(self, rules, turns=100):
+        self._rules = rules
+        self.MP_decay = 1 - rules.bit_decay_per_round
+        self.SP_per_round = rules.cores_per_round
+        self._extend(turns)
+
+    def _extend(self, turns):
+        self.MP_income = self._rules.MP_gained(np.arange(turns))
+        self.SP_income = np.full(turns, float(self.SP_per_round))
+
+    def project_MP(self, current_MP, turn_number, turns_in_future):
+        """Projects MP over the next turns
+
+        Args:
+            current_MP: The MP held on turn_number. A number or an array of starting amounts, such as one per player
+            turn_number: The current turn number
+            turns_in_future: How many turns to project
+
+        Returns:
+            An array with the MP held on turns turn_number + 1 to turn_number + turns_in_future along its last axis,
+            and one row per starting amount if current_MP is an array
+
+        """
+        last_turn = turn_number + turns_in_future + 1
+        if last_turn > len(self.MP_income):
+            self._extend(max(last_turn, 2 * len(self.MP_income)))
+        shape = np.shape(current_MP)
+        MP = np.array(current_MP, dtype=np.float64).reshape(-1)
+        projected = np.empty((len(MP), turns_in_future))
+        for step in range(turns_in_future):
+            MP = _round_tenths(MP * self.MP_decay + self.MP_income[turn_number + step + 1])
+            projected[:, step] = MP
+        return projected.reshape(shape + (turns_in_future,))
+
+    def project_SP(self, current_SP, turn_number, turns_in_future):
+        """Projects SP over the next turns, see project_MP
+        """
+        last_turn = turn_number + turns_in_future + 1
+        if last_turn > len(self.SP_income):
+            self._extend(max(last_turn, 2 * len(self.SP_income)))
+        income = np.cumsum(self.SP_income[turn_number + 1:last_turn])
+        return np.asarray(current_SP, dtype=np.float64)[..., None] + income
+
+    def turns_until_MP(self, current_MP, turn_number, target_MP, max_turns=20):
+        """Finds how many turns it takes to hold at least target_MP
+
+        Args:
+            current_MP: The MP held on turn_number, a number or an array
+            turn_number: The current turn number
+            target_MP: The MP needed, a number or an array matching current_MP
+            max_turns: How far ahead to look
+
+        Returns:
+            The number of turns from now, 0 if current_MP is already enough and -1 if it takes more than max_turns.
+            An array if current_MP or target_MP is an array.
+
+        """
+        current = np.asarray(current_MP, dtype=np.float64)
+        target = np.asarray(target_MP, dtype=np.float64)
+        reached = np.concatenate([(current >= target)[..., None], self.project_MP(current, turn_number, max_turns) >= target[..., None]], axis=-1)
+        turns = np.where(reached.any(axis=-1), reached.argmax(axis=-1), -1)
+        return turns if turns.ndim else int(turns)
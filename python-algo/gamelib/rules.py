@@ -0,0 +1,194 @@
+"""
+The rules of a game, compiled once from the config the engine sends at the start of the game.
+
+AlgoCore.on_game_start compiles the game's RuleSet, and GameState, GameMap and GameUnit take it
+as their rules argument, so nothing has to walk the config dict during a turn.
+Each config gets its own RuleSet, so several games with different configs can run in one process.
+
+Attributes :
+    * SP (int): A constant representing the SP resource, used in the get_resource function and as an index into costs
+    * MP (int): A constant representing the Mobile Points resource, used in the get_resource function and as an index into costs
+
+"""
+import weakref
+from collections import namedtuple
+
+from .projection import ResourceProjection
+
+SP = 0
+MP = 1
+
+
+class UnitSpec(namedtuple("UnitSpec", [
+        "unit_type", "type_index", "stationary", "speed", "damage_f", "damage_i", "attackRange", "shieldRange",
+        "max_health", "shieldPerUnit", "shieldBonusPerY", "cost", "upgraded", "upgraded_spec"])):
+    """The immutable stats of a unit type, shared by every GameUnit of that type.
+    Each type has a base spec and an upgraded spec, see RuleSet.spec.
+
+    Attributes :
+        * unit_type (string): The type's shorthand
+        * type_index (integer): The index of the type in the config's unitInformation
+        * upgraded (bool): Whether these are the stats of an upgraded unit
+        * upgraded_spec (UnitSpec): The spec this one becomes when upgraded, None if this spec is already upgraded
+        * The remaining attributes are described in GameUnit. cost is a tuple (SP, MP).
+
+    """
+    __slots__ = ()
+
+
+def _build_specs(config):
+    specs = {}
+    for type_index, type_config in enumerate(config["unitInformation"]):
+        unit_type = type_config.get("shorthand")
+        upgrade_config = type_config.get("upgrade", {})
+        cost = (type_config.get("cost1", 0), type_config.get("cost2", 0))
+        base = [
+            type_config.get("unitCategory") == 0,
+            type_config.get("speed", 0),
+            type_config.get("attackDamageTower", 0),
+            type_config.get("attackDamageWalker", 0),
+            type_config.get("attackRange", 0),
+            type_config.get("shieldRange", 0),
+            type_config.get("startHealth", 0),
+            type_config.get("shieldPerUnit", 0),
+            type_config.get("shieldBonusPerY", 0)]
+        upgraded = [base[0]] + [upgrade_config.get(key, value) for key, value in zip(
+            ["speed", "attackDamageTower", "attackDamageWalker", "attackRange", "shieldRange",
+             "startHealth", "shieldPerUnit", "shieldBonusPerY"], base[1:])]
+        upgraded_cost = (upgrade_config.get("cost1", 0) + cost[0], upgrade_config.get("cost2", 0) + cost[1])
+        upgraded_spec = UnitSpec(unit_type, type_index, *upgraded, upgraded_cost, True, None)
+        specs[unit_type] = (UnitSpec(unit_type, type_index, *base, cost, False, upgraded_spec), upgraded_spec)
+    return specs
+
+
+class RuleSet:
+    """Everything a turn needs to know about the game's config, read once.
+
+    Attributes :
+        * config (JSON): The config the rules were compiled from
+        * unit_types (tuple): The shorthand of every entry in unitInformation. A type's position is its type id
+        * type_ids (dict): Maps a unit type's shorthand to its type id. 
+          gamelib works with type ids internally, shorthands are only needed to talk to the engine and in the public API
+        * WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR (str): The unit types
+        * REMOVE (str): The type used to remove your own structure
+        * UPGRADE (str): The type used to upgrade a structure
+        * STRUCTURE_TYPES (tuple): The structure types
+        * ALL_UNITS (tuple): The types that can be spawned
+        * specs (dict): Maps a unit type to its (base UnitSpec, upgraded UnitSpec)
+        * base_specs (dict): Maps a unit type's shorthand or type id to its base UnitSpec
+        * is_structure (tuple): is_structure[type_id] is True for the structure types
+        * spawnable (tuple): spawnable[type_id] is True for the types in ALL_UNITS
+        * can_attack_walkers (tuple): can_attack_walkers[type_id] is True if the type deals damage to mobile units, before upgrades
+        * can_attack_structures (tuple): can_attack_structures[type_id] is True if the type deals damage to structures, before upgrades
+        * costs (tuple): costs[type_id] is the cost of the type as a tuple (SP, MP)
+        * upgrade_costs (tuple): upgrade_costs[type_id] is the cost of upgrading the type as a tuple (SP, MP)
+        * upgradable (tuple): upgradable[type_id] is True for the types that can be upgraded
+        * max_attack_range (float): The largest attackRange of any unit type, before upgrades
+        * hit_radius (float): The getHitRadius of the game
+        * bits_per_round, bit_growth_rate, bit_decay_per_round (float), turn_interval_for_bit_schedule (int): The MP schedule
+        * cores_per_round (float): The SP each player gains every turn
+        * projection (ResourceProjection): The MP and SP schedule, for projecting resources many turns and players at once
+
+    """
+
+    def __init__(self, config):
+        self.config = config
+        unit_information = config["unitInformation"]
+        self.unit_types = tuple(type_config.get("shorthand") for type_config in unit_information)
+        self.type_ids = {unit_type: type_id for type_id, unit_type in enumerate(self.unit_types)}
+        (self.WALL, self.SUPPORT, self.TURRET, self.SCOUT, self.DEMOLISHER, self.INTERCEPTOR,
+         self.REMOVE, self.UPGRADE) = self.unit_types[:8]
+        self.STRUCTURE_TYPES = (self.WALL, self.SUPPORT, self.TURRET)
+        self.ALL_UNITS = (self.SCOUT, self.DEMOLISHER, self.INTERCEPTOR, self.WALL, self.SUPPORT, self.TURRET)
+        self._structure_types = frozenset(self.STRUCTURE_TYPES)
+
+        self.specs = _build_specs(config)
+        self.base_specs = {}
+        for unit_type, (base, _) in self.specs.items():
+            self.base_specs[unit_type] = base
+            self.base_specs[base.type_index] = base
+        self.is_structure = tuple(unit_type in self._structure_types for unit_type in self.unit_types)
+        spawnable = frozenset(self.ALL_UNITS)
+        self.spawnable = tuple(unit_type in spawnable for unit_type in self.unit_types)
+        self.can_attack_walkers = tuple(self.specs[unit_type][0].damage_i > 0 for unit_type in self.unit_types)
+        self.can_attack_structures = tuple(self.specs[unit_type][0].damage_f > 0 for unit_type in self.unit_types)
+        costs = []
+        upgrade_costs = []
+        for type_config in unit_information:
+            cost = (type_config.get("cost1", 0), type_config.get("cost2", 0))
+            upgrade_config = type_config.get("upgrade", {})
+            costs.append(cost)
+            upgrade_costs.append((upgrade_config.get("cost1", cost[SP]), upgrade_config.get("cost2", cost[MP])))
+        self.costs = tuple(costs)
+        self.upgrade_costs = tuple(upgrade_costs)
+        self.upgradable = tuple(type_config.get("upgrade", None) is not None for type_config in unit_information)
+        self.max_attack_range = max(type_config.get("attackRange", 0) for type_config in unit_information)
+        self.hit_radius = unit_information[0]["getHitRadius"]
+
+        resources = config.get("resources", {})
+        self.bits_per_round = resources.get("bitsPerRound", 0)
+        self.bit_growth_rate = resources.get("bitGrowthRate", 0)
+        self.bit_decay_per_round = resources.get("bitDecayPerRound", 0)
+        self.turn_interval_for_bit_schedule = resources.get("turnIntervalForBitSchedule", 1)
+        self.cores_per_round = resources.get("coresPerRound", 0)
+        self.projection = ResourceProjection(self)
+
+    def spec(self, unit_type, upgraded=False):
+        """Gets the stats of a unit type
+
+        Args:
+            unit_type: The type of the unit, WALL, SCOUT, etc.
+            upgraded: If true, returns the stats of an upgraded unit
+
+        Returns:
+            The UnitSpec of the unit type
+
+        """
+        return self.specs[unit_type][1 if upgraded else 0]
+
+    def is_stationary(self, unit_type):
+        """
+            Args:
+                unit_type: A unit type
+
+            Returns:
+                Boolean, True if the unit is stationary, False otherwise.
+        """
+        type_id = self.type_ids.get(unit_type)
+        return type_id is not None and self.is_structure[type_id]
+
+    def MP_gained(self, turn_number):
+        """The MP each player gains at the start of the given turn, before decay
+        """
+        return self.bits_per_round + self.bit_growth_rate * (turn_number // self.turn_interval_for_bit_schedule)
+
+
+# Config dicts cannot be weakly referenced, so RuleSets are kept by id(config) until nothing else uses them.
+# A RuleSet holds its config, so the id cannot be reused by another config while its entry is alive.
+_rules_cache = weakref.WeakValueDictionary()
+# The most recently used RuleSet is also kept here, for strategies that create each turn's GameState from the config alone
+_last_rules = None
+
+
+def ruleset(config):
+    """Gets the RuleSet of a config, compiling it the first time the config is seen.
+    The RuleSet is cached while a GameState, GameMap, GameUnit or the caller keeps it, or until another config is used.
+
+    Args:
+        config (JSON): Contains information about the game. A RuleSet is returned as is.
+
+    Returns:
+        The RuleSet of the config
+
+    """
+    global _last_rules
+    if isinstance(config, RuleSet):
+        return config
+    if _last_rules is not None and _last_rules.config is config:
+        return _last_rules
+    cached = _rules_cache.get(id(config))
+    if cached is None or cached.config is not config:
+        cached = RuleSet(config)
+        _rules_cache[id(config)] = cached
+    _last_rules = cached
+    return cached
@@ -1,11 +1,28 @@
 import unittest
+import copy
+import gc
 import json
+import random
+import weakref
+from .algocore import message_type
 from .game_state import GameState
-from .unit import GameUnit
+from .navigation import ShortestPathFinder, FlatPathFinder
+from .batch_navigation import navigate_boards, distance_fields, blocked_stack
+from .tracker import TurnTracker, describe_events
+from .unit import GameUnit, unit_spec
+from .rules import ruleset
+from . import rules as rules_module
+from .planner import SPAWN, UPGRADE, REMOVE
+from . import codec, geometry
+
+# p1Units of a turn message with a friendly turret at [13, 6]
+TURRET_UNITS = [[], [], [[13, 6, 90.0, "1"]], [], [], [], [], []]
+# p1Units of a turn message with a friendly wall at [3, 12] and an upgraded, damaged turret at [13, 6]
+WALL_AND_UPGRADED_TURRET_UNITS = [[[3, 12, 75.0, "1"]], [], [[13, 6, 60.0, "2"]], [], [], [], [], [[13, 6, 0, "3"]]]
 
 class BasicTests(unittest.TestCase):
 
-    def make_turn_0_map(self):
+    def make_turn_0_map(self, p1_units=None, p2_units=None):
         config = """
             {
             "seasonCompatibilityModeP1": 5,
@@ -187,7 +204,12 @@ class BasicTests(unittest.TestCase):
         }
         """
         turn_0 = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
-        
+        if p1_units or p2_units:
+            turn = json.loads(turn_0)
+            turn["p1Units"] = p1_units or turn["p1Units"]
+            turn["p2Units"] = p2_units or turn["p2Units"]
+            turn_0 = json.dumps(turn)
+
         state = GameState(json.loads(config), turn_0)
         state.suppress_warnings(True)
         return state
@@ -235,10 +257,441 @@ class BasicTests(unittest.TestCase):
             game.game_map.add_unit("FF", [13,13])
         self.assertEqual(1, len(game.game_map[13,13]), "Towers seem to be stacking")
         
+    def test_map_planes(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13,13], 1)
+        game.game_map.add_unit("EI", [13,12], 0)
+        game.game_map.add_unit("EI", [13,12], 0)
+        self.assertEqual(2, game.game_map.structure_type[13,13], "Structure type plane was not updated")
+        self.assertEqual(1, game.game_map.structure_owner[13,13], "Structure owner plane was not updated")
+        self.assertEqual(90, game.game_map.structure_health[13,13], "Structure health plane was not updated")
+        self.assertEqual(2, game.game_map.mobile_count[0,13,12], "Mobile count plane was not updated")
+        self.assertEqual(1, game.game_map.structure_mask(1, "DF")[:, 13].sum(), "There should be one enemy turret on row 13")
+        game.game_map.remove_unit([13,13])
+        self.assertEqual(0, game.game_map.structure_mask().sum(), "Removed structures are still in the planes")
+
+    def test_parsed_planes(self):
+        p2_units = [[], [], [[14, 16, 90.0, "4"]], [], [], [], [[14, 16, 0, "5"]]]
+        game = self.make_turn_0_map(WALL_AND_UPGRADED_TURRET_UNITS, p2_units)
+        self.assertEqual(0, game.game_map.structure_type[3,12], "Parsed wall is missing from the planes")
+        self.assertEqual(60, game.game_map.structure_health[13,6], "Parsed health is missing from the planes")
+        self.assertTrue(game.game_map.structure_upgraded[13,6], "Parsed upgrade is missing from the planes")
+        self.assertEqual(1, game.game_map.structure_owner[14,16], "Parsed enemy structure is missing from the planes")
+        self.assertEqual(3, game.game_map.structure_mask().sum(), "Wrong number of structures in the planes")
+        self.assertEqual(game.game_map.structure_mask(0).sum(), sum(1 for loc in game.game_map if game.game_map[loc] and game.game_map[loc][0].player_index == 0))
+
+    def test_load_units(self):
+        loaded = self.make_turn_0_map().game_map
+        appended = self.make_turn_0_map().game_map
+        for game_map in (loaded, appended):
+            game_map.add_unit("EI", [13,12], 0)
+        units = []
+        for unit_type, location, player_index in [("FF", [13,12], 0), ("DF", [14,14], 1), ("EI", [13,0], 0), ("EF", [14,16], 1), ("EI", [13,0], 0)]:
+            unit = GameUnit(unit_type, loaded.config, player_index, None, location[0], location[1])
+            if unit_type == "DF":
+                unit.upgrade()
+                unit.pending_removal = True
+            units.append(unit)
+        loaded._load_units(units)
+        for unit in units:
+            appended._append_unit(copy.copy(unit))
+        for name in ("structure_hash", "blocking_hash", "blocked_bits", "structure_bits", "type_bits", "_occupied", "_unit_index"):
+            self.assertEqual(getattr(appended, name), getattr(loaded, name), "Loading units in bulk built a different {}".format(name))
+        for name in ("structure_type", "structure_owner", "structure_health", "structure_upgraded", "mobile_count"):
+            self.assertEqual(getattr(appended, name).tolist(), getattr(loaded, name).tolist(), "Loading units in bulk built a different {}".format(name))
+        self.assertEqual([[14, 14]], loaded.pending_removal_locations(1), "Loaded pending removal is not indexed")
+        self.assertEqual(2, loaded.mobile_count[0,13,0], "Loaded mobile units are not counted")
+
+    def test_geometry(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(420, geometry.NUM_CELLS, "The board should have 420 locations")
+        self.assertEqual([list(cell) for cell in geometry.CELLS], list(game.game_map), "Cells should be in map iteration order")
+        self.assertEqual(((14, 1), (13, 0)), geometry.NEIGHBORS[14][0], "Neighbours should be in bounds and ordered up, down, right, left")
+        self.assertEqual([[13, 0], [12, 1]], game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)[:2], "Wrong bottom left edge")
+        self.assertTrue(game.game_map.is_on_edge([27, 13], game.game_map.BOTTOM_RIGHT), "[27, 13] is on the bottom right edge")
+        self.assertFalse(game.game_map.in_arena_bounds([5, 20]), "[5, 20] is outside the arena")
+
+    def test_iteration(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13,13], 0)
+        game.game_map.add_unit("DF", [14,14], 1)
+        game.game_map.add_unit("EI", [13,0], 0)
+        pairs = sum(1 for _ in game.game_map for _ in game.game_map)
+        self.assertEqual(420 * 420, pairs, "Nested iteration over the map should visit every pair of locations")
+        self.assertEqual([[13, 0], [13, 13], [14, 14]], list(game.game_map.iter_occupied()), "Wrong occupied locations")
+        self.assertEqual(["DF"], [unit.unit_type for unit in game.game_map.iter_structures(1)], "Wrong enemy structures")
+        self.assertEqual([[13, 0]], [[unit.x, unit.y] for unit in game.game_map.iter_units(0, "EI")], "Wrong friendly units")
+        game.game_map.remove_unit([13,13])
+        self.assertEqual([[13, 0], [14, 14]], list(game.game_map.iter_occupied()), "Removed location is still occupied")
+
+    def test_unit_index(self):
+        p2_units = [[], [], [[14, 16, 90.0, "4"], [15, 16, 90.0, "5"]], [], [], [], [[14, 16, 0, "6"]]]
+        game = self.make_turn_0_map(WALL_AND_UPGRADED_TURRET_UNITS, p2_units)
+        self.assertEqual([[14, 16], [15, 16]], game.game_map.locations_of(1, "DF"), "Wrong enemy turret locations")
+        self.assertEqual([[13, 6]], game.game_map.upgraded_locations(0), "Wrong upgraded locations")
+        self.assertEqual([[14, 16]], game.game_map.pending_removal_locations(1), "Wrong pending removal locations")
+        game.game_map.add_unit("FF", [15, 16], 1)
+        game.game_map.remove_unit([13, 6])
+        self.assertEqual([[14, 16]], game.game_map.locations_of(1, "DF"), "Replaced turret is still indexed")
+        self.assertEqual([[15, 16]], game.game_map.locations_of(1, "FF"), "New wall is not indexed")
+        self.assertEqual([], game.game_map.upgraded_locations(0), "Removed upgrade is still indexed")
+        self.assertEqual(2, len(list(game.game_map.iter_units(None, "FF"))), "Wrong number of walls")
+
+    def test_fork(self):
+        game = self.make_turn_0_map(TURRET_UNITS)
+        game.game_map.add_unit("EI", [13, 0], 0)
+        fork = game.fork()
+        fork.attempt_spawn("FF", [[12, 6], [14, 6]])
+        fork.attempt_upgrade([13, 6])
+        fork.attempt_spawn("EI", [13, 0])
+        fork.game_map.remove_unit([13, 6])
+        self.assertEqual(1, len(game.game_map[13, 6]), "Removing on the fork changed the original")
+        self.assertFalse(game.game_map[13, 6][0].upgraded, "Upgrading on the fork changed the original")
+        self.assertEqual(1, len(game.game_map[13, 0]), "Spawning on the fork changed the original")
+        self.assertEqual(0, len(game.game_map[12, 6]), "Building on the fork changed the original")
+        self.assertEqual([[13, 6]], game.game_map.locations_of(0, "DF"), "The original index changed")
+        self.assertEqual(25, game.get_resource(game.SP), "The original resources changed")
+        self.assertEqual([], game._build_stack, "The original build stack changed")
+        self.assertEqual(2, len(fork.game_map[13, 0]), "The fork did not spawn")
+        self.assertEqual(2, fork.game_map.structure_mask(0, "FF").sum(), "The fork did not build")
+        game.game_map.add_unit("EI", [13, 0], 0)
+        self.assertEqual(2, len(fork.game_map[13, 0]), "Spawning on the original changed the fork")
+        rows = len(game.game_map.units)
+        other = game.fork()
+        other.game_map.remove_unit([13, 6])
+        other.game_map[13, 0] = []
+        self.assertEqual(rows, len(game.game_map.units), "Emptying shared locations should not copy their units")
+        self.assertEqual(1, len(game.game_map[13, 6]), "Removing on the fork changed the original")
+
+    def test_plan(self):
+        game = self.make_turn_0_map(TURRET_UNITS)
+        game.game_map.add_unit("EI", [13, 0], 0)
+        actions = [
+            (SPAWN, "DF", [[12, 6], [13, 6], [13, 0], [14, 14], [14, 6]]),
+            (UPGRADE, None, [[13, 6], [12, 6], [12, 6], [5, 5]]),
+            (SPAWN, "PI", [[13, 0], [14, 0], [13, 5]], 2),
+            (REMOVE, None, [[14, 6], [3, 3]]),
+            (SPAWN, "FF", [[x, 10] for x in range(4, 24)]),
+            (SPAWN, "XX", [13, 0])]
+        expected = game.fork()
+        results = [
+            expected.attempt_spawn("DF", [[12, 6], [13, 6], [13, 0], [14, 14], [14, 6]]),
+            expected.attempt_upgrade([[13, 6], [12, 6], [12, 6], [5, 5]]),
+            expected.attempt_spawn("PI", [[13, 0], [14, 0], [13, 5]], 2),
+            expected.attempt_remove([[14, 6], [3, 3]]),
+            expected.attempt_spawn("FF", [[x, 10] for x in range(4, 24)]),
+            expected.attempt_spawn("XX", [13, 0])]
+
+        plan = game.plan(actions)
+        self.assertEqual(results, plan.results, "The plan disagrees with the sequential calls")
+        self.assertEqual(expected.get_resources(), plan.resources, "The plan spends different resources")
+        self.assertEqual([], game._build_stack, "Planning changed the build stack")
+        self.assertEqual([25, 5], game.get_resources(), "Planning changed the resources")
+        self.assertEqual(0, len(game.game_map[12, 6]), "Planning changed the map")
+
+        self.assertEqual(results, plan.commit(), "Committing changed the results")
+        self.assertEqual(expected._build_stack, game._build_stack, "The plan built a different build stack")
+        self.assertEqual(expected._deploy_stack, game._deploy_stack, "The plan built a different deploy stack")
+        self.assertEqual(expected.get_resources(), game.get_resources(), "The plan left different resources")
+        self.assertEqual(expected.game_map.structure_hash, game.game_map.structure_hash, "The plan built a different map")
+        self.assertEqual(len(expected.game_map[13, 0]), len(game.game_map[13, 0]), "The plan spawned a different number of units")
+
+        # A plan made before the state changed is worked out again when committed
+        game = self.make_turn_0_map()
+        plan = game.plan([(SPAWN, "DF", [[13, 6], [12, 6]])])
+        game.attempt_spawn("DF", [13, 6])
+        self.assertEqual([1], plan.commit(), "The plan was not worked out again")
+        self.assertEqual([("DF", 13, 6), ("DF", 12, 6)], game._build_stack, "The replanned build stack is wrong")
+
+        # Moving a mobile unit onto a planned location leaves the structures and number of occupied locations unchanged
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("PI", [13, 0], 0)
+        plan = game.plan([(SPAWN, "FF", [12, 1])])
+        game.game_map.remove_unit([13, 0])
+        game.game_map.add_unit("PI", [12, 1], 0)
+        self.assertEqual([0], plan.commit(), "The plan built on top of a mobile unit")
+        self.assertEqual("PI", game.game_map[12, 1][0].unit_type, "The plan replaced the mobile unit")
+
+    def test_lazy_map(self):
+        built = GameState.parse_stats['maps_built']
+        game = self.make_turn_0_map(TURRET_UNITS)
+        self.assertEqual(0, game.turn_number, "Scalars should be read without the map")
+        self.assertEqual(25, game.get_resource(game.SP), "Resources should be read without the map")
+        self.assertEqual(built, GameState.parse_stats['maps_built'], "The map was built before it was used")
+        fork = game.fork()
+        self.assertEqual(built, GameState.parse_stats['maps_built'], "Forking built the map")
+        self.assertTrue(game.contains_stationary_unit([13, 6]), "The lazily built map is missing units")
+        self.assertFalse(game.game_map.enable_warnings, "The lazily built map ignored suppress_warnings")
+        self.assertEqual(built + 1, GameState.parse_stats['maps_built'], "The map should be built once")
+        fork.attempt_spawn("FF", [12, 6])
+        self.assertEqual(0, len(game.game_map[12, 6]), "The fork shares its lazily built map")
+        self.assertEqual(1, len(fork.game_map[13, 6]), "The fork is missing units")
+
+    def test_parsed_state(self):
+        game = self.make_turn_0_map(TURRET_UNITS)
+        parsed = GameState(game.config, json.loads(game.serialized_string))
+        self.assertEqual(game.turn_number, parsed.turn_number, "A decoded state has the wrong turn number")
+        self.assertEqual(game.get_resources(1), parsed.get_resources(1), "A decoded state has the wrong resources")
+        self.assertEqual(game.game_map.structure_hash, parsed.game_map.structure_hash, "A decoded state has different units")
+        self.assertEqual(0, message_type(game.serialized_string), "A turn message was not recognized")
+        self.assertEqual(1, message_type('{"p1Units":[], "turnInfo": [1, 3, 12]}'), "An action frame was not recognized")
+        self.assertEqual(2, message_type('{"turnInfo":[2,10,-1,400]}'), "The end message was not recognized")
+        self.assertIsNone(message_type('{"replaySave":1}'), "A message without turnInfo has a type")
+
+    def test_codec(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(json.loads(game.serialized_string), codec.loads(game.serialized_string), "{} decodes differently".format(codec.BACKEND))
+        game.attempt_spawn("DF", [[13, 6], [14, 6]])
+        game.attempt_spawn("SI", [13, 0], 2)
+        for stack in (game._build_stack, game._deploy_stack, []):
+            self.assertEqual(json.dumps(stack), codec.write_commands(stack), "Commands are written differently")
+            self.assertEqual(json.loads(json.dumps(stack)), json.loads(codec.encode_commands(stack)), "{} encodes commands differently".format(codec.BACKEND))
+        self.assertEqual(json.dumps([["S\"I", 1, 2]]), codec.write_commands([("S\"I", 1, 2)]), "Unit types are not escaped")
+
+    def test_tracker(self):
+        game = self.make_turn_0_map()
+        tracker = TurnTracker(game.config)
+        turns = [
+            [[[13, 6, 60.0, "1"]], [], [[12, 6, 75.0, "2"]], [], [], [], [], []],
+            [[[13, 6, 60.0, "1"]], [], [[12, 6, 70.0, "2"], [15, 8, 75.0, "3"]], [[13, 0, 15.0, "4"]], [], [], [[13, 6, 0.0, "8"]], [[12, 6, 0.0, "9"]]],
+            [[], [], [[12, 6, 70.0, "2"], [15, 8, 75.0, "3"]], [], [], [], [], [[12, 6, 0.0, "9"]]],
+        ]
+        enemy = [[], [], [[13, 14, 75.0, "5"], [14, 14, 75.0, "6"], [15, 14, 75.0, "7"]], [], [], [], [], []]
+        turn = json.loads(game.serialized_string)
+        all_events = []
+        for turn_number, p1_units in enumerate(turns):
+            turn["turnInfo"][1] = turn_number
+            turn["p1Units"] = p1_units
+            turn["p2Units"] = enemy if turn_number == 1 else [[]] * 8
+            built = GameState.parse_stats['maps_built']
+            tracked, events = tracker.update(json.dumps(turn))
+            self.assertEqual(built + 1, GameState.parse_stats['maps_built'], "The tracked map was not counted")
+            all_events.append(events)
+            parsed = GameState(game.config, json.dumps(turn))
+            self.assertEqual(turn_number, tracked.turn_number, "The tracked state has the wrong turn number")
+            for location in parsed.game_map:
+                self.assertEqual(str(parsed.game_map[location]), str(tracked.game_map[location]), "The tracked map differs at {}".format(location))
+            self.assertEqual(parsed.game_map.structure_hash, tracked.game_map.structure_hash, "The tracked structure hash differs")
+            self.assertEqual(parsed.game_map.blocked_bits, tracked.game_map.blocked_bits, "The tracked blocked cells differ")
+            self.assertTrue((parsed.game_map.mobile_count == tracked.game_map.mobile_count).all(), "The tracked mobile units differ")
+        self.assertEqual(["you added 1 DF on row 6", "you added 1 FF on row 6"], describe_events(all_events[0]), "Wrong first turn events")
+        self.assertEqual(["you added 1 DF on row 8", "you damaged 1 DF on row 6", "you removing 1 FF on row 6",
+                          "you upgraded 1 DF on row 6", "enemy added 3 DF on row 14"], describe_events(all_events[1]), "Wrong second turn events")
+        self.assertEqual(["you removed 1 FF on row 6", "enemy removed 3 DF on row 14"], describe_events(all_events[2]), "Wrong third turn events")
+        tracked.attempt_spawn("FF", [[13, 7]])
+        self.assertEqual(0, len(tracker.game_map[13, 7]), "Spawning on the returned state changed the tracker")
+
+    def test_rollback(self):
+        game = self.make_turn_0_map(TURRET_UNITS)
+        turret = game.game_map[13, 6][0]
+        game.begin()
+        game.attempt_spawn("FF", [[12, 6], [14, 6]])
+        game.attempt_upgrade([13, 6])
+        game.begin()
+        game.attempt_spawn("EI", [13, 0], 2)
+        game.attempt_remove([13, 6])
+        game.rollback()
+        self.assertEqual(0, len(game.game_map[13, 0]), "Inner rollback did not remove the spawned units")
+        self.assertEqual(5, game.get_resource(game.MP), "Inner rollback did not restore MP")
+        self.assertEqual(3, len(game._build_stack), "Inner rollback removed too much from the build stack")
+        game.rollback()
+        self.assertEqual(25, game.get_resource(game.SP), "Rollback did not restore SP")
+        self.assertEqual([], game._build_stack, "Rollback did not restore the build stack")
+        self.assertEqual(0, len(game.game_map[12, 6]), "Rollback did not remove the built wall")
+        self.assertIs(turret, game.game_map[13, 6][0], "Rollback replaced the existing turret")
+        self.assertFalse(turret.upgraded, "Rollback did not undo the upgrade")
+        self.assertFalse(game.game_map.structure_upgraded[13, 6], "Rollback did not restore the planes")
+        game.begin()
+        game.attempt_spawn("FF", [12, 6])
+        game.commit()
+        self.assertEqual(1, len(game.game_map[12, 6]), "Commit did not keep the wall")
+
+    def test_fork_then_rollback(self):
+        game = self.make_turn_0_map(TURRET_UNITS)
+        game.begin()
+        game.attempt_spawn("EI", [13, 0])
+        game.attempt_upgrade([13, 6])
+        fork = game.fork()
+        game.rollback()
+        self.assertEqual(0, len(game.game_map[13, 0]), "Rollback did not remove the spawned unit")
+        self.assertFalse(game.game_map[13, 6][0].upgraded, "Rollback did not undo the upgrade")
+        self.assertEqual(1, len(fork.game_map[13, 0]), "Rollback removed the unit from the fork")
+        self.assertEqual(1, fork.game_map.mobile_count[0, 13, 0], "The fork's planes disagree with its units")
+        self.assertEqual([[13, 0], [13, 6]], list(fork.game_map.iter_occupied()), "The fork's occupied locations are wrong")
+        self.assertTrue(fork.game_map[13, 6][0].upgraded, "Rollback undid the fork's upgrade")
+        self.assertTrue(fork.game_map.structure_upgraded[13, 6], "The fork's planes disagree with its units")
+        poor = game.fork()
+        poor._player_resources[0]['SP'] = 0
+        rows = len(poor.game_map.units)
+        poor.begin()
+        self.assertEqual(0, poor.attempt_upgrade([13, 6]), "Upgraded without enough SP")
+        poor.rollback()
+        self.assertEqual(rows, len(poor.game_map.units), "A failed upgrade copied the location")
+
+    def test_flat_path_finder(self):
+        rng = random.Random(5)
+        reference = ShortestPathFinder()
+        finder = FlatPathFinder()
+        for density in (0.0, 0.2, 0.4, 0.6):
+            game = self.make_turn_0_map()
+            for location in game.game_map:
+                if rng.random() < density:
+                    game.game_map.add_unit("FF", location, int(location[1] >= 14))
+            for edge in range(4):
+                end_points = game.game_map.get_edge_locations(edge)
+                starts = [location for location in game.game_map if rng.random() < 0.1] + [tuple(end_points[2])]
+                expected = [reference.navigate_multiple_endpoints(start, end_points, game) for start in starts]
+                for start, path in zip(starts, expected):
+                    self.assertEqual(path, finder.navigate_multiple_endpoints(start, end_points, game),
+                                     "Paths from {} to edge {} differ".format(start, edge))
+                self.assertEqual(expected, finder.navigate_from_starts(starts, end_points, game), "Paths from many starts differ")
+            starts = [location for location in game.game_map if location[1] < 14 and rng.random() < 0.3]
+            self.assertEqual([game.find_path_to_edge(start) for start in starts], game.find_paths_to_edge(starts),
+                             "find_paths_to_edge differs from find_path_to_edge")
+
+    def test_path_cache(self):
+        game = self.make_turn_0_map()
+        cache = GameState.path_cache
+        cache.clear()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual((0, 1), (cache.hits, cache.misses), "The first path should be a miss")
+        path[1][0] = -5
+        again = game.find_path_to_edge([13, 0])
+        self.assertEqual((1, 1), (cache.hits, cache.misses), "The second path should be a hit")
+        self.assertEqual(ShortestPathFinder().navigate_multiple_endpoints([13, 0], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), game),
+                         again, "The cached path is wrong")
+
+        fork = game.fork()
+        fork.game_map.add_unit("FF", again[3], 0)
+        self.assertNotEqual(again, fork.find_path_to_edge([13, 0]), "Blocking the path did not invalidate it")
+        self.assertEqual(2, cache.misses, "A changed board should miss")
+        self.assertEqual(again, game.find_paths_to_edge([[13, 0]])[0], "find_paths_to_edge should share the cache")
+        self.assertEqual(2, cache.hits, "find_paths_to_edge did not use the cache")
+
+    def test_path_field(self):
+        rng = random.Random(9)
+        game = self.make_turn_0_map()
+        for location in game.game_map:
+            if location[1] < 14 and rng.random() < 0.3:
+                game.game_map.add_unit("FF", location, 0)
+        start = next(location for location in game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)
+                     if not game.contains_stationary_unit(location))
+        field = game.path_field(start)
+        self.assertEqual(game.find_path_to_edge(start), field.path(), "The field starts from a different path")
+        fork = game.fork()
+        for _ in range(40):
+            location = list(geometry.CELLS[rng.randrange(geometry.NUM_CELLS)])
+            if location == start:
+                continue
+            if fork.contains_stationary_unit(location):
+                field.unblock(location)
+                fork.game_map.remove_unit(location)
+            else:
+                field.block(location)
+                fork.game_map.add_unit("FF", location, 0 if location[1] < 14 else 1)
+            self.assertEqual(fork.game_map.blocked_bits, field.blocked_bits, "The field blocks different locations")
+            self.assertEqual(fork.find_path_to_edge(start), field.path(), "The repaired path differs after editing {}".format(location))
+        self.assertGreater(field.repairs, 0, "No edit was repaired")
+        self.assertEqual(game.find_path_to_edge(start), game.path_field(start).path(), "Editing the field changed the game map")
+
+    def test_batch_navigation(self):
+        rng = random.Random(13)
+        games = []
+        for density in (0.0, 0.1, 0.3, 0.5, 0.7):
+            game = self.make_turn_0_map()
+            for location in game.game_map:
+                if rng.random() < density:
+                    game.game_map.add_unit("FF", location, int(location[1] >= 14))
+            games.append(game)
+        blocked = blocked_stack([game.game_map for game in games])
+        self.assertEqual((5, 28, 28), blocked.shape, "Wrong blocked stack shape")
+        for edge in range(4):
+            end_points = games[0].game_map.get_edge_locations(edge)
+            for start in [location for location in games[0].game_map if rng.random() < 0.05] + [end_points[3]]:
+                paths = navigate_boards(blocked, start, end_points)
+                for game, path in zip(games, paths):
+                    self.assertEqual(ShortestPathFinder().navigate_multiple_endpoints(start, end_points, game), path,
+                                     "Batched path from {} to edge {} differs".format(start, edge))
+
+        start = [13, 0]
+        fields, targets = distance_fields(blocked, start, games[0].game_map.get_edge_locations(games[0].game_map.TOP_RIGHT))
+        self.assertEqual(0, fields[0, 27, 14], "An end point should be at distance 0 on an empty board")
+        self.assertEqual([-1, -1], list(targets[0]), "A unit on an empty board should path to the edge")
+
+    def test_distance_tables(self):
+        game = self.make_turn_0_map()
+        cells = game.game_map.cell_indices([[13, 0], [14, 4], [0, 13]])
+        targets = game.game_map.cell_indices([[13, 3], [27, 14]])
+        distances = game.game_map.distance_matrix(cells, targets)
+        self.assertEqual((3, 2), distances.shape, "Wrong distance matrix shape")
+        self.assertAlmostEqual(3, distances[0, 0], 7, "The distance between 13,0 and 13,3 should be 3")
+        self.assertAlmostEqual(game.game_map.distance_between_locations([0, 13], [27, 14]), distances[2, 1], 7, "Table and scalar distances disagree")
+        self.assertEqual([[False, False], [True, False], [False, False]], game.game_map.in_range_matrix(cells, targets, 1.5).tolist(), "Wrong range mask")
+        # At a distance of exactly 2, and at 2 less than the hit radius, the range mask and the range query differ
+        center, edge = game.game_map.cell_indices([[13, 13], [15, 13]])
+        self.assertTrue(game.game_map.in_range_matrix([center], [edge], 2)[0, 0], "The range mask should include its radius")
+        self.assertIn(edge, game.game_map.get_cells_in_range([13, 13], 2), "Range queries should include their radius")
+        radius = 2 - game.rules.hit_radius / 2
+        self.assertFalse(game.game_map.in_range_matrix([center], [edge], radius)[0, 0], "The range mask should not add the hit radius")
+        self.assertIn(edge, game.game_map.get_cells_in_range([13, 13], radius), "Range queries should add the hit radius")
+        self.assertEqual(-1, game.game_map.cell_indices([[0, 0]])[0], "Off board locations should not have a cell index")
+
+    def test_board_hash(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(0, game.game_map.blocking_hash, "An empty board should have a zero hash")
+        game.game_map.add_unit("FF", [13, 6], 0)
+        game.game_map.add_unit("DF", [14, 16], 1)
+        structure_hash = game.game_map.structure_hash
+        blocking_hash = game.game_map.blocking_hash
+        game.game_map.add_unit("EI", [13, 0], 0)
+        self.assertEqual(blocking_hash, game.game_map.blocking_hash, "Mobile units should not change the blocking hash")
+        game.game_map.add_unit("DF", [13, 6], 0)
+        self.assertNotEqual(structure_hash, game.game_map.structure_hash, "Replacing a wall with a turret should change the structure hash")
+        self.assertEqual(blocking_hash, game.game_map.blocking_hash, "Replacing a structure should not change the blocking hash")
+        game.game_map.add_unit("FF", [13, 6], 0)
+        self.assertEqual(structure_hash, game.game_map.structure_hash, "Restoring the wall should restore the structure hash")
+
+        other = self.make_turn_0_map()
+        other.game_map.add_unit("DF", [14, 16], 1)
+        other.game_map.add_unit("FF", [13, 6], 0)
+        self.assertEqual(structure_hash, other.game_map.structure_hash, "The hash should not depend on the order of edits")
+        other.attempt_upgrade([13, 6])
+        self.assertNotEqual(structure_hash, other.game_map.structure_hash, "Upgrading should change the structure hash")
+        other.game_map.remove_unit([13, 6])
+        self.assertNotEqual(blocking_hash, other.game_map.blocking_hash, "Removing a structure should change the blocking hash")
+
+    def test_bitboards(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13, 6], 0)
+        game.game_map.add_unit("DF", [14, 6], 0)
+        game.game_map.add_unit("DF", [14, 16], 1)
+        game.game_map.add_unit("EI", [13, 0], 0)
+        self.assertEqual([[13, 6], [14, 6], [14, 16]], geometry.bits_to_locations(game.game_map.blocked_bits), "Wrong blocked cells")
+        self.assertEqual([[14, 16]], geometry.bits_to_locations(game.game_map.structure_bits[1]), "Wrong enemy structures")
+        self.assertEqual([[14, 6]], geometry.bits_to_locations(game.game_map.type_bits[(0, game.rules.type_ids["DF"])]), "Wrong friendly turrets")
+        free_bottom = geometry.HALF_BITS[0] & ~game.game_map.blocked_bits
+        self.assertEqual(208, bin(free_bottom).count("1"), "Wrong number of free cells on our half")
+        adjacent = geometry.adjacent_bits(geometry.locations_to_bits([[13, 5]])) & game.game_map.blocked_bits
+        self.assertEqual([[13, 6]], geometry.bits_to_locations(adjacent), "Wrong structures next to 13,5")
+        game.game_map.add_unit("FF", [14, 6], 0)
+        game.game_map.remove_unit([14, 16])
+        self.assertEqual(0, game.game_map.type_bits[(0, game.rules.type_ids["DF"])], "Replaced turret is still in the type bitboard")
+        self.assertEqual((geometry.locations_to_bits([[13, 6], [14, 6]]), 0), game.game_map.structure_bits, "Wrong player bitboards")
+        self.assertFalse(game.can_spawn("FF", [14, 6]), "Should not be able to build on a blocked location")
+
     def test_get_units_in_range(self):
         game = self.make_turn_0_map()
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Wrong number of tiles in range")
+        cells = game.game_map.get_cells_in_range([13,13], 3.5)
+        self.assertIs(cells, game.game_map.get_cells_in_range([13,13], 3.5), "Range queries should be served from the cache")
+        self.assertEqual([list(geometry.CELLS[index]) for index in cells], game.game_map.get_locations_in_range([13,13], 3.5), "Cells and locations in range should match")
+        self.assertEqual(6, len(game.game_map.get_locations_in_range([13,0], 2)), "Range should be clipped to the board")
+        self.assertIs(cells, game.game_map.get_cells_in_range([13.0, 13.0], 3.5), "Float locations should find their cell")
+        between = [location for location in game.game_map if game.game_map.distance_between_locations([13.5, 13], location) < 3.5 + game.rules.hit_radius]
+        self.assertEqual(sorted(between), sorted(game.game_map.get_locations_in_range([13.5, 13], 3.5)), "Wrong locations around a point between cells")
+        game.game_map.add_unit("DF", [12, 12], 1)
+        self.assertEqual(1, len(game.get_attackers([13.0, 13.0], 0)), "Float locations should find their attackers")
 
     def _test_get_attackers(self):
         game = self.make_turn_0_map()
@@ -264,6 +717,82 @@ class BasicTests(unittest.TestCase):
         expected_string = "Enemy FF, health: 75.0 location: [14, 13] removal:  upgrade: False "
         self.assertEqual(got_string, expected_string, "Expected {} from print_unit test got {} ".format(expected_string, got_string))
 
+    def test_unit_specs(self):
+        game = self.make_turn_0_map()
+        first = GameUnit("DF", game.config, 0, None, 13, 6)
+        second = GameUnit("DF", game.config, 1, None, 14, 16)
+        self.assertIs(first.spec, second.spec, "Units of the same type should share a spec")
+        self.assertEqual(2.5, first.attackRange, "Wrong base range")
+        first.upgrade()
+        self.assertEqual(3.5, first.attackRange, "Upgrading should use the upgraded stats")
+        self.assertEqual(15.0, first.damage_i, "Upgrading should use the upgraded stats")
+        self.assertEqual(6.0, first.cost[game.SP], "Upgraded cost should include the base cost")
+        self.assertEqual(2.5, second.attackRange, "Upgrading one unit changed another")
+        self.assertIs(first.spec, unit_spec(game.config, "DF", True), "Upgraded units should share the upgraded spec")
+
+    def test_rules(self):
+        game = self.make_turn_0_map()
+        rules = game.rules
+        self.assertIs(rules, ruleset(game.config), "The config should be compiled once")
+        config = json.loads(json.dumps(game.config))
+        compiled = weakref.ref(ruleset(config))
+        gc.collect()
+        self.assertIs(compiled(), ruleset(config), "The last rules used should stay cached")
+        ruleset(game.config)
+        gc.collect()
+        self.assertNotIn(id(config), rules_module._rules_cache, "Unused rules should not be kept in the cache")
+        self.assertEqual(("FF", "EF", "DF"), rules.STRUCTURE_TYPES, "Wrong structure types")
+        self.assertEqual(2, rules.type_ids[rules.TURRET], "Wrong type id")
+        self.assertEqual(rules.max_attack_range, max(spec.attackRange for spec, _ in rules.specs.values()), "Wrong max range")
+        self.assertEqual(list(rules.costs[rules.type_ids["DF"]]), game.type_cost("DF"), "Wrong cost")
+        self.assertTrue(rules.upgradable[rules.type_ids["DF"]], "Turrets should be upgradable")
+
+        config = json.loads(json.dumps(game.config))
+        config["unitInformation"][2]["cost1"] = 1.0
+        cheap = GameState(config, game.serialized_string)
+        self.assertEqual([1.0, 0], cheap.type_cost("DF"), "The second config's costs are not used")
+        self.assertEqual(list(rules.costs[rules.type_ids["DF"]]), game.type_cost("DF"), "A second config changed the first")
+        self.assertEqual(25, cheap.number_affordable("DF"), "The second config's costs are not used")
+        self.assertNotEqual(25, game.number_affordable("DF"), "A second config changed the first")
+
+    def test_type_ids(self):
+        game = self.make_turn_0_map()
+        rules = game.rules
+        wall, turret, scout = rules.type_ids["FF"], rules.type_ids["DF"], rules.type_ids["PI"]
+        self.assertEqual((True, True, True, False, False, False, False, False), rules.is_structure, "Wrong structure table")
+        self.assertTrue(rules.can_attack_walkers[turret], "Turrets should attack mobile units")
+        self.assertFalse(rules.can_attack_walkers[wall], "Walls should not attack")
+        self.assertFalse(rules.spawnable[rules.type_ids["RM"]], "RM is not a unit")
+        unit = GameUnit(scout, game.config, 0)
+        self.assertEqual("PI", unit.unit_type, "A unit created from a type id has the wrong type")
+        self.assertEqual(scout, unit.type_id, "Wrong type id")
+        self.assertIsNone(game.attempt_spawn("RM", [13, 0]), "RM should not be spawnable")
+
+    def test_unit_table(self):
+        p2_units = [[[13, 14, 30.0, "1"]], [], [[14, 16, 90.0, "2"], [15, 16, 45.0, "3"]], [], [], [], [], []]
+        game = self.make_turn_0_map(None, p2_units)
+        game.game_map.add_unit("DF", [13, 6], 0)
+        turret = game.game_map[15, 16][0]
+        self.assertIs(game.game_map.units, turret._table, "Parsed units should be views of the map's table")
+        self.assertEqual(4, len(game.game_map.units), "Wrong number of rows")
+        self.assertEqual((15, 16, 1, 45.0), (turret.x, turret.y, turret.player_index, turret.health), "Wrong view fields")
+        self.assertEqual(135.0, game.game_map.sum_structure_health([[14, 16], [15, 16], [13, 6], [0, 0]], 1), "Wrong enemy health total")
+        turret.health = 5
+        self.assertEqual(95.0, game.game_map.sum_structure_health([[14, 16], [15, 16]], 1), "Health changes should be visible to reductions")
+        self.assertEqual([1, 1, 1, 0], game.game_map.units.column("owner").tolist(), "Wrong owner column")
+        loose = GameUnit("FF", game.config)
+        self.assertEqual((-1, -1, None, 75.0), (loose.x, loose.y, loose.player_index, loose.health), "Wrong fields for a unit created on its own")
+        with self.assertRaises(AttributeError):
+            loose.new_attribute = True
+        rows = len(game.game_map.units)
+        for _ in range(10):
+            fork = game.fork()
+            fork.game_map.add_unit("FF", [12, 6], 0)
+            fork.attempt_upgrade([13, 6])
+        del fork
+        self.assertEqual(rows + 2, len(game.game_map.units), "Rows of discarded forks should be reused")
+        self.assertEqual(125.0, game.game_map.sum_structure_health([[13, 14], [14, 16], [15, 16]], 1), "Reusing rows changed live units")
+
     def test_future_MP(self):
         game = self.make_turn_0_map()
 
@@ -271,6 +800,21 @@ class BasicTests(unittest.TestCase):
         self.future_turn_testing_function(game, 11.6, 2)
         self.future_turn_testing_function(game, 13.7, 3)
 
+    def test_resource_projection(self):
+        game = self.make_turn_0_map()
+        projection = game.rules.projection
+        starts = [1.0, 5.0, 8.3, 12.15, 40.0]
+        projected = projection.project_MP(starts, game.turn_number, 6)
+        self.assertEqual((5, 6), projected.shape, "Wrong projection shape")
+        for row, start in enumerate(starts):
+            for turns in range(1, 7):
+                self.assertEqual(game.project_future_MP(turns, 0, start), projected[row, turns - 1], "The vector projection differs from project_future_MP")
+        self.assertEqual(3, projection.turns_until_MP(5.0, 0, 12), "Wrong number of turns to reach 12 MP")
+        self.assertEqual([0, 3, -1], list(projection.turns_until_MP([20.0, 5.0, 5.0], 0, [12, 12, 1000])), "Wrong number of turns to reach a target")
+        resources = game.project_future_resources(3)
+        self.assertEqual([30.0, 35.0, 40.0], list(resources[1, game.SP]), "Wrong SP projection")
+        self.assertEqual(game.project_future_MP(3, 1), resources[1, game.MP, 2], "Wrong MP projection")
+
     def future_turn_testing_function(self, game, expected, turns):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
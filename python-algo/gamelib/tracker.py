@@ -0,0 +1,176 @@
+"""
+Keeps the game map from one turn to the next, so a new turn only costs as much as what changed.
+
+TurnTracker.update takes the turn message the engine sends at the start of every turn and returns
+a GameState for it, just like GameState(config, turn_state), and a list of StructureEvents describing
+how the structures on the board changed since the previous turn.
+"""
+from collections import namedtuple, Counter
+
+from . import codec
+from .game_state import GameState
+from .game_map import GameMap
+from .unit import GameUnit
+from .rules import ruleset
+
+ADDED = "added"
+REMOVED = "removed"
+UPGRADED = "upgraded"
+DAMAGED = "damaged"
+REPAIRED = "repaired"
+REMOVING = "removing"
+
+StructureEvent = namedtuple("StructureEvent", ["kind", "player_index", "unit_type", "x", "y", "health", "previous_health"])
+StructureEvent.__doc__ = """A change to a structure between two turns
+
+Attributes :
+    * kind (str): ADDED, REMOVED, UPGRADED, DAMAGED, REPAIRED or REMOVING (the owner marked it for removal)
+    * player_index (int): The player controlling the structure, 0 for you 1 for the enemy
+    * unit_type (str): The structure type
+    * x, y (int): The location of the structure
+    * health (float): The health of the structure this turn, None if it was removed
+    * previous_health (float): The health of the structure last turn, None if it was added
+
+"""
+
+# Fields of the entries describing one unit in a location, see TurnTracker._read_cells
+_TYPE, _PLAYER, _HEALTH, _UPGRADED, _PENDING = range(5)
+
+
+def describe_events(events):
+    """Summarizes events by player, kind, unit type and row
+
+    Args:
+        events: A list of StructureEvents, as returned by TurnTracker.update
+
+    Returns:
+        A list of strings such as "enemy added 3 DF on row 14"
+
+    """
+    counts = Counter((event.player_index, event.kind, event.unit_type, event.y) for event in events)
+    return ["{} {} {} {} on row {}".format("you" if player_index == 0 else "enemy", kind, count, unit_type, y)
+            for (player_index, kind, unit_type, y), count in sorted(counts.items())]
+
+
+class TurnTracker:
+    """Builds the GameState of each turn from the previous turn's map and the locations that changed
+
+    Locations whose units are the same as last turn are shared with the previous map,
+    and only changed locations are rebuilt, so the map comes out the same as a freshly parsed GameState.
+    The GameState returned each turn gets its own fork of the tracked map,
+    so spawning or removing units on it does not affect the next turn.
+
+    Attributes :
+        * config (JSON): The game config
+        * rules (RuleSet): The rules compiled from config
+        * game_map (:obj: GameMap): The map of the most recent turn, as sent by the engine
+        * last_events (list): The StructureEvents of the most recent update
+
+    """
+
+    def __init__(self, config, rules=None):
+        self.config = config
+        self.rules = ruleset(config) if rules is None else rules
+        self.game_map = GameMap(config, self.rules)
+        self.last_events = []
+        self._cells = {}
+        self._types = self.rules.unit_types
+        self._remove_index = self.rules.type_ids[self.rules.REMOVE]
+        self._upgrade_index = self.rules.type_ids[self.rules.UPGRADE]
+        self._stationary = [self.rules.spec(unit_type).stationary for unit_type in self._types[:self._remove_index]]
+
+    def update(self, turn_state):
+        """Reads the state at the start of a turn
+
+        Args:
+            turn_state: The turn message from the engine, as a json string or already decoded
+
+        Returns:
+            The GameState for this turn and a list of StructureEvents
+
+        """
+        if isinstance(turn_state, str):
+            turn_state = codec.loads(turn_state)
+        game_state = GameState(self.config, turn_state, self.rules)
+        cells = self._read_cells(turn_state["p1Units"], turn_state["p2Units"])
+
+        game_map = self.game_map.fork()
+        events = []
+        for location in self._cells.keys() | cells.keys():
+            old = self._cells.get(location)
+            new = cells.get(location)
+            if old == new:
+                continue
+            self._diff(location, old, new, events)
+            self._rebuild(game_map, location, new)
+
+        self.game_map = game_map
+        self._cells = cells
+        # The map was updated in place of the one GameState would have built
+        GameState.parse_stats['maps_built'] += 1
+        self.last_events = events
+        game_state.game_map = game_map.fork()
+        game_state.game_map.enable_warnings = game_state.enable_warnings
+        return game_state, events
+
+    def _read_cells(self, p1units, p2units):
+        """
+        Groups the units in the message by location, in the same order GameState adds them to the map.
+        Each location maps to a tuple of (type index, player, health, upgraded, pending removal) entries.
+        """
+        cells = {}
+        for player_index, units in enumerate((p1units, p2units)):
+            for type_index, unit_list in enumerate(units):
+                for uinfo in unit_list:
+                    location = (int(uinfo[0]), int(uinfo[1]))
+                    entries = cells.get(location)
+                    if type_index == self._remove_index or type_index == self._upgrade_index:
+                        # Like GameState, this marks the first unit if there is a structure at the location
+                        if entries and self._structure(entries) is not None:
+                            flag = _PENDING if type_index == self._remove_index else _UPGRADED
+                            entries[0][flag] = True
+                    else:
+                        cells.setdefault(location, []).append([type_index, player_index, float(uinfo[2]), False, False])
+        return {location: tuple(tuple(entry) for entry in entries) for location, entries in cells.items()}
+
+    def _rebuild(self, game_map, location, entries):
+        x, y = location
+        game_map.remove_unit([x, y])
+        for type_index, player_index, health, upgraded, pending_removal in entries or ():
+            unit = GameUnit(type_index, self.config, player_index, health, x, y, game_map.units, self.rules)
+            if upgraded:
+                unit.upgrade()
+            unit.pending_removal = pending_removal
+            game_map._append_unit(unit)
+
+    def _diff(self, location, old, new, events):
+        old_structure = self._structure(old)
+        new_structure = self._structure(new)
+        if old_structure == new_structure:
+            return
+        if old_structure is not None and (new_structure is None or new_structure[:_HEALTH] != old_structure[:_HEALTH]):
+            events.append(self._event(REMOVED, location, old_structure, None, old_structure[_HEALTH]))
+            old_structure = None
+        if new_structure is None:
+            return
+        if old_structure is None:
+            events.append(self._event(ADDED, location, new_structure, new_structure[_HEALTH], None))
+            return
+        health, previous_health = new_structure[_HEALTH], old_structure[_HEALTH]
+        if new_structure[_UPGRADED] and not old_structure[_UPGRADED]:
+            events.append(self._event(UPGRADED, location, new_structure, health, previous_health))
+        if new_structure[_PENDING] and not old_structure[_PENDING]:
+            events.append(self._event(REMOVING, location, new_structure, health, previous_health))
+        if health < previous_health:
+            events.append(self._event(DAMAGED, location, new_structure, health, previous_health))
+        elif health > previous_health:
+            events.append(self._event(REPAIRED, location, new_structure, health, previous_health))
+
+    def _event(self, kind, location, structure, health, previous_health):
+        return StructureEvent(kind, structure[_PLAYER], self._types[structure[_TYPE]], location[0], location[1], health, previous_health)
+
+    def _structure(self, entries):
+        for entry in entries or ():
+            if self._stationary[entry[_TYPE]]:
+                return entry
+        return None
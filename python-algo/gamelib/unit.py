@@ -1,3 +1,9 @@
+from array import array
+import numpy as np
+
+from .rules import UnitSpec, ruleset
+
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -9,12 +15,163 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+def unit_specs(config):
+    """Gets the specs of every unit type in a config, see RuleSet.specs
+
+    Args:
+        config (JSON): Contains information about the game, or its RuleSet
+
+    Returns:
+        A dict mapping each unit type's shorthand to a (base UnitSpec, upgraded UnitSpec) tuple
+
+    """
+    return ruleset(config).specs
+
+
+def unit_spec(config, unit_type, upgraded=False):
+    """Gets the stats of a unit type without creating a GameUnit
+
+    Args:
+        config (JSON): Contains information about the game, or its RuleSet
+        unit_type: The type of the unit, WALL, SCOUT, etc.
+        upgraded: If true, returns the stats of an upgraded unit
+
+    Returns:
+        The UnitSpec of the unit type
+
+    """
+    return ruleset(config).spec(unit_type, upgraded)
+
+
+class UnitTable:
+    """Stores the fields of many units in parallel columns, one row per unit. 
+    GameMap keeps one for the units on the map, and each GameUnit is a view of one row, 
+    so whole board questions can be answered with vectorized reductions over a column.
+
+    Rows are never removed. When a GameUnit is garbage collected its row is released, 
+    and the next unit added to the table reuses it, so a table only grows to the most units alive at once.
+
+    Attributes :
+        * x, y (array): The coordinates of each unit
+        * type_index (array): The index of each unit's type in the config's unitInformation
+        * owner (array): The player index controlling each unit, -1 if it has none
+        * health (array): The current health of each unit
+        * upgraded (array): 1 if the unit is upgraded, 0 otherwise
+        * pending_removal (array): 1 if the unit is marked for removal, 0 otherwise
+        * specs (list): The UnitSpec of each unit
+
+    """
+    COLUMNS = ("x", "y", "type_index", "owner", "health", "upgraded", "pending_removal")
+    _TYPECODES = {"x": "b", "y": "b", "type_index": "b", "owner": "b", "health": "d", "upgraded": "b", "pending_removal": "b"}
+    _DTYPES = {"b": np.int8, "d": np.float64}
+
+    def __init__(self):
+        for name in self.COLUMNS:
+            setattr(self, name, array(self._TYPECODES[name]))
+        self.specs = []
+        self._free = []
+
+    def __len__(self):
+        return len(self.specs)
+
+    def append(self, spec, player_index, health, x, y, upgraded=False, pending_removal=False):
+        """Adds a row and returns its index
+        """
+        if self._free:
+            return self._reuse((int(x), int(y), spec.type_index, -1 if player_index is None else player_index, 
+                                health, bool(upgraded), bool(pending_removal), spec))
+        self.x.append(int(x))
+        self.y.append(int(y))
+        self.type_index.append(spec.type_index)
+        self.owner.append(-1 if player_index is None else player_index)
+        self.health.append(health)
+        self.upgraded.append(bool(upgraded))
+        self.pending_removal.append(bool(pending_removal))
+        self.specs.append(spec)
+        return len(self.specs) - 1
+
+    def get_row(self, row):
+        """Gets every field of a row as a tuple, in the order of COLUMNS followed by the spec
+        """
+        return tuple(getattr(self, name)[row] for name in self.COLUMNS) + (self.specs[row],)
+
+    def set_row(self, row, values):
+        """Overwrites every field of a row with a tuple returned by get_row
+        """
+        for name, value in zip(self.COLUMNS, values):
+            getattr(self, name)[row] = value
+        self.specs[row] = values[-1]
+
+    def copy_row(self, row, table=None):
+        """Appends a copy of a row to this table, or to another table if one is given, and returns the new row's index
+        """
+        table = self if table is None else table
+        if table._free:
+            return table._reuse(self.get_row(row))
+        table.x.append(self.x[row])
+        table.y.append(self.y[row])
+        table.type_index.append(self.type_index[row])
+        table.owner.append(self.owner[row])
+        table.health.append(self.health[row])
+        table.upgraded.append(self.upgraded[row])
+        table.pending_removal.append(self.pending_removal[row])
+        table.specs.append(self.specs[row])
+        return len(table.specs) - 1
+
+    def release(self, row):
+        """Marks a row as unused so a later append or copy_row can reuse it. Called when its GameUnit is garbage collected.
+        """
+        self._free.append(row)
+
+    def _reuse(self, values):
+        row = self._free.pop()
+        self.set_row(row, values)
+        return row
+
+    def column(self, name, rows=None):
+        """Gets a column as a NumPy array
+
+        Args:
+            name: One of COLUMNS
+            rows: A sequence of row indices to read. Every row if None.
+
+        Returns:
+            A new ndarray, changing it does not change the table
+
+        """
+        values = np.frombuffer(getattr(self, name), dtype=self._DTYPES[self._TYPECODES[name]])
+        if rows is None:
+            return values.copy()
+        return values[np.asarray(rows, dtype=np.intp)]
+
+
+def _spec_attribute(name):
+    return property(lambda unit: getattr(unit._table.specs[unit._row], name), doc="Read from this unit's UnitSpec")
+
+
+def _column_attribute(name, convert):
+    def get(unit):
+        return convert(getattr(unit._table, name)[unit._row])
+
+    def set(unit, value):
+        getattr(unit._table, name)[unit._row] = value
+    return property(get, set, doc="Stored in the {} column of this unit's UnitTable".format(name))
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    A GameUnit is a view of one row of a UnitTable. Units on a GameMap share the map's table, 
+    a unit created on its own gets a table of its own. The stats that only depend on the unit's type 
+    are read from a UnitSpec shared by every unit of that type, so creating a unit does not parse 
+    the config and upgrading it only swaps the spec.
+
     Attributes :
         * unit_type (string): This unit's type
+        * type_id (integer): This unit's type id, see RuleSet.type_ids
         * config (JSON): Contains information about the game
+        * rules (RuleSet): The rules compiled from config
+        * spec (UnitSpec): The stats of this unit's type, the upgraded stats if this unit is upgraded
         * player_index (integer): The player that controls this unit. 0 for you, 1 for your opponent.
         * x (integer): The x coordinate of the unit
         * y (integer): The y coordinate of the unit
@@ -32,49 +189,86 @@ class GameUnit:
         * upgraded (boolean): If this unit is upgraded
 
     """
-    def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
+    __slots__ = ("_table", "_row", "rules")
+
+    unit_type = _spec_attribute("unit_type")
+    type_id = _spec_attribute("type_index")
+    stationary = _spec_attribute("stationary")
+    speed = _spec_attribute("speed")
+    damage_f = _spec_attribute("damage_f")
+    damage_i = _spec_attribute("damage_i")
+    attackRange = _spec_attribute("attackRange")
+    shieldRange = _spec_attribute("shieldRange")
+    max_health = _spec_attribute("max_health")
+    shieldPerUnit = _spec_attribute("shieldPerUnit")
+    shieldBonusPerY = _spec_attribute("shieldBonusPerY")
+    cost = _spec_attribute("cost")
+
+    x = _column_attribute("x", int)
+    y = _column_attribute("y", int)
+    health = _column_attribute("health", float)
+    upgraded = _column_attribute("upgraded", bool)
+    pending_removal = _column_attribute("pending_removal", bool)
+
+    def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1, table=None, rules=None):
         """ Initialize unit variables using args passed
 
         """
-        self.unit_type = unit_type
-        self.config = config
-        self.player_index = player_index
-        self.pending_removal = False
-        self.upgraded = False
-        self.x = x
-        self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self.rules = ruleset(config) if rules is None else rules
+        spec = self.rules.base_specs[unit_type]
+        self._table = UnitTable() if table is None else table
+        self._row = self._table.append(spec, player_index, spec.max_health if not health else health, x, y)
 
+    @property
+    def config(self):
+        return self.rules.config
 
-    def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
-        self.upgraded = True
+    @property
+    def spec(self):
+        return self._table.specs[self._row]
+
+    @property
+    def player_index(self):
+        owner = self._table.owner[self._row]
+        return None if owner < 0 else owner
 
+    @player_index.setter
+    def player_index(self, value):
+        self._table.owner[self._row] = -1 if value is None else value
+
+    def __copy__(self):
+        clone = GameUnit.__new__(GameUnit)
+        clone.rules = self.rules
+        clone._table = self._table
+        clone._row = self._table.copy_row(self._row)
+        return clone
+
+    def _move_to(self, table):
+        """Moves this unit's row to another table, keeping the unit's identity
+        """
+        if table is not self._table:
+            row = self._table.copy_row(self._row, table)
+            self._table.release(self._row)
+            self._row = row
+            self._table = table
+
+    def __del__(self):
+        # Each row is viewed by exactly one GameUnit, so it can be reused once that unit is gone
+        row = getattr(self, "_row", None)
+        if row is not None:
+            self._table.release(row)
+
+    def _snapshot(self):
+        return self._table.get_row(self._row)
+
+    def _restore(self, snapshot):
+        self._table.set_row(self._row, snapshot)
+
+    def upgrade(self):
+        spec = self._table.specs[self._row]
+        if spec.upgraded_spec is not None:
+            self._table.specs[self._row] = spec.upgraded_spec
+        self._table.upgraded[self._row] = True
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -86,4 +280,3 @@ class GameUnit:
 
     def __repr__(self):
         return self.__toString()
-
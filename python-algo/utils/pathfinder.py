@@ -1,4 +1,4 @@
-import gamelib
+from gamelib.geometry import NEIGHBORS
 # from gamelib.game_map import WALL
 
 UNIT_WEIGHTS = {
@@ -29,23 +29,20 @@ def most_convenient_spawn_location(game_state, location_options, turret, wall, u
         estimate the path's damage risk.
         """
         weights = UNIT_WEIGHTS[unit_type]
+        turret_damage = game_state.rules.spec(turret).damage_i
         damages = []
         path_lengths = []
         enemy_walls = []
         supports = []
-        # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
+        # Get the damage estimate each path will take, the paths share one search of the board
+        for path in game_state.find_paths_to_edge(location_options):
             damage = 0
             path_length = 0
             enemy_wall_amount = 0
             support_amount = 0
             for path_location in path:
                 # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += (
-                    len(game_state.get_attackers(path_location, 0))
-                    * gamelib.GameUnit(turret, game_state.config).damage_i
-                )
+                damage += len(game_state.get_attackers(path_location, 0)) * turret_damage
 
                 # get number of walls alongside the path
                 enemy_wall_amount += count_adjacent_enemy_walls(game_state, path_location, wall)
@@ -71,18 +68,14 @@ def count_adjacent_enemy_walls(game_state, path_location, wall):
     Count the amount of enemy walls next to a location (the more the worse)
     """
     x, y = path_location
-    adjacent_dirs = [(x+1, y), (x-1, y), 
-                    (x, y+1), (x, y-1)]
     adj_wall_count = 0
+    wall_id = game_state.rules.type_ids[wall]
 
-    for nx, ny in adjacent_dirs:
-        # stay in bounds
-        if not game_state.game_map.in_arena_bounds((nx, ny)):
-            continue
-
+    # NEIGHBORS only holds the adjacent locations that are in bounds
+    for nx, ny in NEIGHBORS[x][y]:
         unit = game_state.contains_stationary_unit((nx, ny))
         # if there's a unit and it's an enemy wall, bump the counter
-        if unit and unit.unit_type == wall and unit.player_index == 1:
+        if unit and unit.type_id == wall_id and unit.player_index == 1:
             adj_wall_count += 1
 
     return adj_wall_count
@@ -93,17 +86,14 @@ def count_support_points(game_state, location):
     """
     support_type = "SUPPORT"
     support_range = 3.5
-    count = 0
-
-    for pos in game_state.game_map:
-        units = game_state.game_map[pos]
-        for unit in units:
-            if unit.unit_type == support_type and unit.player_index == 0:
-                distance = ((pos[0] - location[0]) ** 2 + (pos[1] - location[1]) ** 2) ** 0.5
-                if distance <= support_range:
-                    count += 1
-                    break  # Only count each support location once
-    return count
+
+    # Each support location is only counted once
+    supports = game_state.game_map.locations_of(0, support_type)
+    if not supports:
+        return 0
+    game_map = game_state.game_map
+    in_range = game_map.in_range_matrix(game_map.cell_indices(supports), game_map.cell_indices([location]), support_range)
+    return int(in_range.sum())
 
 def get_best_scoring_path_index(damages, path_lengths, enemy_walls, supports, weights):
     # lowest score is best score so i gave the initial best score a rlly high number so it will get replaced immediately